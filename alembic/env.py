@@ -1,7 +1,7 @@
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from db import create_engine, database_url
 from models import Base
 from alembic import context
 
@@ -20,6 +20,23 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 # target_metadata = None
 
+# Tables created by hand-written migrations (the FTS5 search and trigram
+# indexes and their shadow tables) have no model; keep autogenerate from
+# proposing to drop them.
+UNMAPPED_TABLE_PREFIXES = ("book_fts", "author_trigram", "title_trigram")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and reflected and name.startswith(UNMAPPED_TABLE_PREFIXES):
+        return False
+    return True
+
+
+def get_url():
+    """The database to migrate: one set on the Config by the caller, else the CLI's."""
+    return config.attributes.get("database_url") or database_url
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -38,10 +55,11 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
+    url = get_url()
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -57,15 +75,13 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
+    connectable = create_engine(get_url(), poolclass=pool.NullPool)
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,58 @@
+"""move stock into inventory table
+
+Revision ID: 5d7669d4a2f3
+Revises: 4711752052ce
+Create Date: 2026-10-18 09:39:23.202317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7669d4a2f3'
+down_revision: Union[str, None] = '4711752052ce'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('quantity_in_stock', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['book.book_id'], ),
+    sa.PrimaryKeyConstraint('book_id')
+    )
+
+    # Stock used to be read from the first order item of each book
+    op.execute("""
+        INSERT INTO inventory (book_id, quantity_in_stock)
+        SELECT book.book_id, COALESCE(order_item.quantity_in_stock, 0)
+        FROM book
+        LEFT OUTER JOIN order_item ON order_item.order_id = (
+            SELECT MIN(first_item.order_id) FROM order_item AS first_item
+            WHERE first_item.book_id = book.book_id
+        )
+    """)
+
+    # Rows that add-book created only to hold stock are not orders
+    op.execute("DELETE FROM order_item WHERE customer_id IS NULL AND order_date IS NULL")
+
+    with op.batch_alter_table('order_item') as batch_op:
+        batch_op.add_column(sa.Column('quantity', sa.Integer(), server_default='1', nullable=False))
+        batch_op.drop_column('quantity_in_stock')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('order_item') as batch_op:
+        batch_op.add_column(sa.Column('quantity_in_stock', sa.INTEGER(), nullable=True))
+        batch_op.drop_column('quantity')
+
+    op.execute("""
+        UPDATE order_item SET quantity_in_stock = (
+            SELECT quantity_in_stock FROM inventory WHERE inventory.book_id = order_item.book_id
+        )
+    """)
+    op.drop_table('inventory')
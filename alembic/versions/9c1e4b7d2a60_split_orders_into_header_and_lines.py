@@ -0,0 +1,87 @@
+"""split orders into header and lines
+
+Revision ID: 9c1e4b7d2a60
+Revises: 23a15a306731
+Create Date: 2026-10-18 14:02:11.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4b7d2a60'
+down_revision: Union[str, None] = '23a15a306731'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('orders',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.Column('order_date', sa.Date(), nullable=True),
+    sa.Column('total_amount', sa.Float(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['customer_id'], ['customer.customer_id'], ),
+    sa.PrimaryKeyConstraint('order_id')
+    )
+    op.create_index('ix_orders_customer_id_order_date', 'orders', ['customer_id', 'order_date'], unique=False)
+    op.create_table('order_line',
+    sa.Column('line_id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['book.book_id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ),
+    sa.PrimaryKeyConstraint('line_id')
+    )
+    op.create_index(op.f('ix_order_line_book_id'), 'order_line', ['book_id'], unique=False)
+    op.create_index(op.f('ix_order_line_order_id'), 'order_line', ['order_id'], unique=False)
+
+    # Every order item becomes an order of one line, keeping its order ID
+    op.execute("""
+        INSERT INTO orders (order_id, customer_id, order_date, total_amount)
+        SELECT order_id, customer_id, order_date, COALESCE(total_amount, 0) FROM order_item
+    """)
+    op.execute("""
+        INSERT INTO order_line (line_id, order_id, book_id, quantity, unit_price)
+        SELECT order_id, order_id, book_id, quantity, total_amount / quantity FROM order_item
+    """)
+
+    op.drop_index('ix_order_item_customer_id_order_date', table_name='order_item')
+    op.drop_index(op.f('ix_order_item_book_id'), table_name='order_item')
+    op.drop_table('order_item')
+
+
+def downgrade() -> None:
+    op.create_table('order_item',
+    sa.Column('order_id', sa.INTEGER(), nullable=False),
+    sa.Column('customer_id', sa.INTEGER(), nullable=True),
+    sa.Column('book_id', sa.INTEGER(), nullable=True),
+    sa.Column('order_date', sa.DATE(), nullable=True),
+    sa.Column('total_amount', sa.FLOAT(), nullable=True),
+    sa.Column('quantity', sa.INTEGER(), server_default='1', nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['book.book_id'], ),
+    sa.ForeignKeyConstraint(['customer_id'], ['customer.customer_id'], ),
+    sa.PrimaryKeyConstraint('order_id')
+    )
+    op.create_index(op.f('ix_order_item_book_id'), 'order_item', ['book_id'], unique=False)
+    op.create_index('ix_order_item_customer_id_order_date', 'order_item', ['customer_id', 'order_date'], unique=False)
+
+    # Each line becomes an order item of its own; baskets cannot be kept together
+    op.execute("""
+        INSERT INTO order_item (order_id, customer_id, book_id, order_date, total_amount, quantity)
+        SELECT order_line.line_id, orders.customer_id, order_line.book_id, orders.order_date,
+               ROUND(order_line.unit_price * order_line.quantity, 2), order_line.quantity
+        FROM order_line
+        JOIN orders ON orders.order_id = order_line.order_id
+    """)
+
+    op.drop_index(op.f('ix_order_line_order_id'), table_name='order_line')
+    op.drop_index(op.f('ix_order_line_book_id'), table_name='order_line')
+    op.drop_table('order_line')
+    op.drop_index('ix_orders_customer_id_order_date', table_name='orders')
+    op.drop_table('orders')
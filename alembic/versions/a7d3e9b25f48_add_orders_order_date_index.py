@@ -0,0 +1,28 @@
+"""add orders order_date index
+
+Revision ID: a7d3e9b25f48
+Revises: f1a9c3e6d270
+Create Date: 2026-10-18 18:41:17.604922
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9b25f48'
+down_revision: Union[str, None] = 'f1a9c3e6d270'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # reorder-report and archive-orders read recent or old orders of every
+    # customer by date, which ix_orders_customer_id_order_date cannot serve
+    op.create_index(op.f('ix_orders_order_date'), 'orders', ['order_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_orders_order_date'), table_name='orders')
@@ -0,0 +1,42 @@
+"""add customer summary table
+
+Revision ID: b3f0d8e51c27
+Revises: 9c1e4b7d2a60
+Create Date: 2026-10-18 15:21:47.902634
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f0d8e51c27'
+down_revision: Union[str, None] = '9c1e4b7d2a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('customer_summary',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('total_spent', sa.Float(), nullable=False),
+    sa.Column('last_order_date', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customer.customer_id'], ),
+    sa.PrimaryKeyConstraint('customer_id')
+    )
+    op.create_index(op.f('ix_orders_customer_id'), 'orders', ['customer_id'], unique=False)
+
+    # Summarise the existing order history
+    op.execute("""
+        INSERT INTO customer_summary (customer_id, order_count, total_spent, last_order_date)
+        SELECT customer_id, COUNT(*), SUM(total_amount), MAX(order_date) FROM orders
+        WHERE customer_id IS NOT NULL GROUP BY customer_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_orders_customer_id'), table_name='orders')
+    op.drop_table('customer_summary')
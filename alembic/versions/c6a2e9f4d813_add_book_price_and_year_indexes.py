@@ -0,0 +1,30 @@
+"""add book price and year indexes
+
+Revision ID: c6a2e9f4d813
+Revises: b3f0d8e51c27
+Create Date: 2026-10-18 16:05:32.118470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6a2e9f4d813'
+down_revision: Union[str, None] = 'b3f0d8e51c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite ends every index with the rowid, so these are (price, book_id)
+    # and (publication_year, book_id): range scans come out already sorted
+    op.create_index(op.f('ix_book_price'), 'book', ['price'], unique=False)
+    op.create_index(op.f('ix_book_publication_year'), 'book', ['publication_year'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_book_publication_year'), table_name='book')
+    op.drop_index(op.f('ix_book_price'), table_name='book')
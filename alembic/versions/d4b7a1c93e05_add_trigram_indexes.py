@@ -0,0 +1,81 @@
+"""add trigram indexes
+
+Revision ID: d4b7a1c93e05
+Revises: c6a2e9f4d813
+Create Date: 2026-10-18 16:48:09.551372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b7a1c93e05'
+down_revision: Union[str, None] = 'c6a2e9f4d813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# author_trigram and title_trigram index every three-character run of the
+# author names and book titles, for the typo-tolerant lookups in
+# commands/fuzzy.py.  They are external-content tables, reading the text
+# from author_genre and book, so only the index itself is stored.  The
+# triggers below keep them in step with the base tables.
+TRIGGERS = {
+    'author_trigram_ai': """
+        CREATE TRIGGER author_trigram_ai AFTER INSERT ON author_genre BEGIN
+            INSERT INTO author_trigram(rowid, author_name) VALUES (new.id, new.author_name);
+        END
+    """,
+    'author_trigram_au': """
+        CREATE TRIGGER author_trigram_au AFTER UPDATE OF author_name ON author_genre BEGIN
+            INSERT INTO author_trigram(author_trigram, rowid, author_name) VALUES ('delete', old.id, old.author_name);
+            INSERT INTO author_trigram(rowid, author_name) VALUES (new.id, new.author_name);
+        END
+    """,
+    'author_trigram_ad': """
+        CREATE TRIGGER author_trigram_ad AFTER DELETE ON author_genre BEGIN
+            INSERT INTO author_trigram(author_trigram, rowid, author_name) VALUES ('delete', old.id, old.author_name);
+        END
+    """,
+    'title_trigram_ai': """
+        CREATE TRIGGER title_trigram_ai AFTER INSERT ON book BEGIN
+            INSERT INTO title_trigram(rowid, title) VALUES (new.book_id, new.title);
+        END
+    """,
+    'title_trigram_au': """
+        CREATE TRIGGER title_trigram_au AFTER UPDATE OF title ON book BEGIN
+            INSERT INTO title_trigram(title_trigram, rowid, title) VALUES ('delete', old.book_id, old.title);
+            INSERT INTO title_trigram(rowid, title) VALUES (new.book_id, new.title);
+        END
+    """,
+    'title_trigram_ad': """
+        CREATE TRIGGER title_trigram_ad AFTER DELETE ON book BEGIN
+            INSERT INTO title_trigram(title_trigram, rowid, title) VALUES ('delete', old.book_id, old.title);
+        END
+    """,
+}
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE author_trigram USING fts5("
+        "author_name, content = 'author_genre', content_rowid = 'id', tokenize = 'trigram')"
+    )
+    op.execute(
+        "CREATE VIRTUAL TABLE title_trigram USING fts5("
+        "title, content = 'book', content_rowid = 'book_id', tokenize = 'trigram')"
+    )
+    op.execute("INSERT INTO author_trigram(author_trigram) VALUES ('rebuild')")
+    op.execute("INSERT INTO title_trigram(title_trigram) VALUES ('rebuild')")
+    for ddl in TRIGGERS.values():
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS title_trigram")
+    op.execute("DROP TABLE IF EXISTS author_trigram")
@@ -0,0 +1,34 @@
+"""enable incremental vacuum
+
+Revision ID: e5c8f2a07b14
+Revises: d4b7a1c93e05
+Create Date: 2026-10-18 17:32:40.215093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c8f2a07b14'
+down_revision: Union[str, None] = 'd4b7a1c93e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# archive-orders frees pages in bulk and returns them to the file system
+# with PRAGMA incremental_vacuum, which only works in auto_vacuum
+# INCREMENTAL mode.  Switching an existing database into it takes one full
+# VACUUM, and VACUUM cannot run inside a transaction.
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        op.execute("VACUUM")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA auto_vacuum = NONE")
+        op.execute("VACUUM")
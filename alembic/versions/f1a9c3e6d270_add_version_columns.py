@@ -0,0 +1,32 @@
+"""add version columns
+
+Revision ID: f1a9c3e6d270
+Revises: e5c8f2a07b14
+Create Date: 2026-10-18 18:04:51.730624
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a9c3e6d270'
+down_revision: Union[str, None] = 'e5c8f2a07b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Row versions for optimistic concurrency: every update checks and bumps them
+VERSIONED_TABLES = ('book', 'customer', 'inventory')
+
+
+def upgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.drop_column(table, 'version')
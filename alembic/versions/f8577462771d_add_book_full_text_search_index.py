@@ -0,0 +1,99 @@
+"""add book full-text search index
+
+Revision ID: f8577462771d
+Revises: 21ce5a010aa4
+Create Date: 2026-10-18 09:24:42.429596
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8577462771d'
+down_revision: Union[str, None] = '21ce5a010aa4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# book_fts holds one row per book (rowid = book.book_id) with the title and
+# the denormalised author and genre names, so search-books can answer from
+# the index alone.  The triggers below keep it in step with the base tables.
+TRIGGERS = {
+    'book_fts_ai': """
+        CREATE TRIGGER book_fts_ai AFTER INSERT ON book BEGIN
+            INSERT INTO book_fts(rowid, title, author_name, genre_name)
+            VALUES (
+                new.book_id,
+                new.title,
+                (SELECT author_name FROM author_genre WHERE id = new.author_id),
+                (SELECT genre_name FROM genre WHERE id = new.genre_id)
+            );
+        END
+    """,
+    'book_fts_au': """
+        CREATE TRIGGER book_fts_au AFTER UPDATE OF title, author_id, genre_id ON book BEGIN
+            DELETE FROM book_fts WHERE rowid = old.book_id;
+            INSERT INTO book_fts(rowid, title, author_name, genre_name)
+            VALUES (
+                new.book_id,
+                new.title,
+                (SELECT author_name FROM author_genre WHERE id = new.author_id),
+                (SELECT genre_name FROM genre WHERE id = new.genre_id)
+            );
+        END
+    """,
+    'book_fts_ad': """
+        CREATE TRIGGER book_fts_ad AFTER DELETE ON book BEGIN
+            DELETE FROM book_fts WHERE rowid = old.book_id;
+        END
+    """,
+    'book_fts_author_au': """
+        CREATE TRIGGER book_fts_author_au AFTER UPDATE OF author_name ON author_genre BEGIN
+            UPDATE book_fts SET author_name = new.author_name
+            WHERE rowid IN (SELECT book_id FROM book WHERE author_id = new.id);
+        END
+    """,
+    'book_fts_author_ad': """
+        CREATE TRIGGER book_fts_author_ad AFTER DELETE ON author_genre BEGIN
+            UPDATE book_fts SET author_name = NULL
+            WHERE rowid IN (SELECT book_id FROM book WHERE author_id = old.id);
+        END
+    """,
+    'book_fts_genre_au': """
+        CREATE TRIGGER book_fts_genre_au AFTER UPDATE OF genre_name ON genre BEGIN
+            UPDATE book_fts SET genre_name = new.genre_name
+            WHERE rowid IN (SELECT book_id FROM book WHERE genre_id = new.id);
+        END
+    """,
+    'book_fts_genre_ad': """
+        CREATE TRIGGER book_fts_genre_ad AFTER DELETE ON genre BEGIN
+            UPDATE book_fts SET genre_name = NULL
+            WHERE rowid IN (SELECT book_id FROM book WHERE genre_id = old.id);
+        END
+    """,
+}
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE book_fts USING fts5("
+        "title, author_name, genre_name, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    op.execute("""
+        INSERT INTO book_fts(rowid, title, author_name, genre_name)
+        SELECT book.book_id, book.title, author_genre.author_name, genre.genre_name
+        FROM book
+        LEFT OUTER JOIN author_genre ON author_genre.id = book.author_id
+        LEFT OUTER JOIN genre ON genre.id = book.genre_id
+    """)
+    for ddl in TRIGGERS.values():
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS book_fts")
@@ -0,0 +1,227 @@
+"""Asyncio JSON HTTP API over the bookstore database.
+
+Serves the same operations as the CLI to the web storefront from one
+process, with a shared pool of aiosqlite connections:
+
+    GET  /books?after=ID&limit=N
+    GET  /books/search?q=...&title=...&author=...&genre=...&limit=N
+                       &min_price=...&max_price=...&year_from=...&year_to=...&sort=...
+    GET  /inventory?after=ID&limit=N
+    GET  /customers?after=ID&limit=N
+    GET  /orders?after=ID&limit=N
+    POST /orders  {"customer_id", "book_id", "order_date", "total_amount", "quantity"}
+
+List responses carry ``next_after``, the ``after`` value of the next page,
+or null on the last page. Each order is listed with its lines.
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import click
+
+try:
+    import aiosqlite  # noqa: F401  (the async SQLite driver)
+    import greenlet  # noqa: F401  (needed by SQLAlchemy's asyncio support)
+    from aiohttp import web
+except ImportError as error:
+    raise SystemExit("The HTTP API needs aiohttp, aiosqlite and greenlet: "
+                     "pip install aiohttp aiosqlite 'sqlalchemy[asyncio]'") from error
+
+from commands.books import (
+    SEARCH_BOOKS_SQL, SEARCH_SORTS, book_list_query, book_search_statement, fts_match, inventory_list_query,
+)
+from commands.common import paginate
+from commands.customers import customer_list_query
+from commands.orders import order_list_query, sell_book
+from db import AsyncDBSession, get_async_engine, retry_on_lock_async
+from models import Book, Customer, Order
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# Orders are written one at a time per process, so concurrent requests
+# queue here instead of contending for SQLite's single write lock
+WRITE_LOCK = web.AppKey('write_lock', asyncio.Lock)
+
+
+def _error(response_class, message):
+    return response_class(text=json.dumps({'error': message}), content_type='application/json')
+
+
+def _int_param(request, name, default=None):
+    value = request.query.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise _error(web.HTTPBadRequest, f"{name} must be an integer")
+
+
+def _float_param(request, name):
+    value = request.query.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise _error(web.HTTPBadRequest, f"{name} must be a number")
+
+
+def _page(request):
+    after = _int_param(request, 'after')
+    limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise _error(web.HTTPBadRequest, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return after, limit
+
+
+def _list_handler(name, list_query, key, to_json):
+    """A handler serving one page of a CLI list command's query."""
+
+    async def handler(request):
+        after, limit = _page(request)
+        async with AsyncDBSession() as session:
+            # Run the CLI's own query builder and keyset pagination on the async connection
+            rows = await session.run_sync(
+                lambda sync_session: paginate(list_query(sync_session), key, after, limit, False).all()
+            )
+        return web.json_response({
+            name: [to_json(row) for row in rows],
+            'next_after': getattr(rows[-1], key.key) if len(rows) == limit else None,
+        })
+
+    return handler
+
+
+list_books = _list_handler('books', book_list_query, Book.book_id, lambda row: {
+    'book_id': row[0], 'title': row[1], 'author': row[2], 'genre': row[3], 'version': row[4],
+})
+
+list_inventory = _list_handler('inventory', inventory_list_query, Book.book_id, lambda row: {
+    'book_id': row[0], 'title': row[1], 'quantity_in_stock': row[2], 'stock_version': row[3],
+})
+
+list_customers = _list_handler('customers', customer_list_query, Customer.customer_id, lambda row: {
+    'customer_id': row[0], 'name': row[1], 'email': row[2], 'phone': row[3], 'version': row[4],
+})
+
+list_orders = _list_handler('orders', order_list_query, Order.order_id, lambda order: {
+    'order_id': order.order_id,
+    'customer_id': order.customer_id,
+    'order_date': order.order_date.isoformat() if order.order_date else None,
+    'total_amount': order.total_amount,
+    'lines': [
+        {'book_id': line.book_id, 'quantity': line.quantity, 'unit_price': line.unit_price}
+        for line in order.lines
+    ],
+})
+
+
+async def search_books(request):
+    query = request.query
+    match = fts_match(query.get('q'), query.get('title'), query.get('author'), query.get('genre'))
+    ranges = (
+        _float_param(request, 'min_price'), _float_param(request, 'max_price'),
+        _int_param(request, 'year_from'), _int_param(request, 'year_to'),
+    )
+    sort = query.get('sort')
+    if sort is not None and sort != 'relevance' and sort not in SEARCH_SORTS:
+        raise _error(web.HTTPBadRequest, f"sort must be one of relevance, {', '.join(SEARCH_SORTS)}")
+    ranged = sort is not None or any(value is not None for value in ranges)
+    if not match and not ranged:
+        raise _error(web.HTTPBadRequest, "Please provide q, title, author, genre, a price or year range, or sort.")
+    limit = _int_param(request, 'limit', 20)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise _error(web.HTTPBadRequest, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    async with AsyncDBSession() as session:
+        if ranged:
+            result = await session.execute(book_search_statement(match, *ranges, sort, limit))
+        else:
+            result = await session.execute(SEARCH_BOOKS_SQL, {'match': match, 'limit': limit})
+        books = result.all()
+    if ranged:
+        return web.json_response({'books': [
+            {'book_id': book_id, 'title': title, 'author': author_name, 'genre': genre_name,
+             'publication_year': publication_year, 'price': price}
+            for book_id, title, author_name, genre_name, publication_year, price in books
+        ]})
+    return web.json_response({'books': [
+        {'book_id': book_id, 'title': title, 'author': author_name, 'genre': genre_name}
+        for book_id, title, author_name, genre_name in books
+    ]})
+
+
+async def add_order(request):
+    """Record a sale and take it out of stock, as add-order-item does."""
+    try:
+        body = await request.json()
+        customer_id = int(body['customer_id'])
+        book_id = int(body['book_id'])
+        order_date = datetime.strptime(body['order_date'], '%Y-%m-%d').date()
+        total_amount = float(body['total_amount'])
+        quantity = int(body.get('quantity', 1))
+    except KeyError as error:
+        raise _error(web.HTTPBadRequest, f"missing {error.args[0]}")
+    except (TypeError, ValueError):
+        raise _error(web.HTTPBadRequest, "expected a JSON object with customer_id, book_id, "
+                                         "order_date (YYYY-MM-DD), total_amount and quantity")
+    if quantity < 1:
+        raise _error(web.HTTPBadRequest, "quantity must be at least 1")
+
+    async with request.app[WRITE_LOCK], AsyncDBSession() as session:
+        if await session.get(Customer, customer_id) is None:
+            raise _error(web.HTTPNotFound, f"Customer with ID {customer_id} does not exist.")
+        book = await session.get(Book, book_id)
+        if book is None:
+            raise _error(web.HTTPNotFound, f"Book with ID {book_id} does not exist.")
+
+        # Other processes (till scripts, imports) can still hold the lock
+        order_id = await retry_on_lock_async(
+            lambda: session.run_sync(sell_book, book, customer_id, order_date, total_amount, quantity),
+            rollback=session.rollback,
+        )
+
+    if order_id is None:
+        raise _error(web.HTTPConflict, f"Not enough stock for book with ID {book_id}.")
+    return web.json_response({'order_id': order_id}, status=201)
+
+
+async def _open_pool(app):
+    # Open the first connection now rather than on the first request
+    async with get_async_engine().connect():
+        pass
+
+
+async def _close_pool(app):
+    await get_async_engine().dispose()
+
+
+def create_app():
+    app = web.Application()
+    app[WRITE_LOCK] = asyncio.Lock()
+    app.on_startup.append(_open_pool)
+    app.on_cleanup.append(_close_pool)
+    app.router.add_get('/books', list_books)
+    app.router.add_get('/books/search', search_books)
+    app.router.add_get('/inventory', list_inventory)
+    app.router.add_get('/customers', list_customers)
+    app.router.add_get('/orders', list_orders)
+    app.router.add_post('/orders', add_order)
+    return app
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help="Interface to listen on.")
+@click.option('--port', type=int, default=8080, show_default=True, help="Port to listen on.")
+@click.option('--access-log', is_flag=True, help="Log every request.")
+def serve(host, port, access_log):
+    """Serve the bookstore as a JSON HTTP API"""
+    # aiohttp's default access log costs a noticeable share of each request
+    web.run_app(create_app(), host=host, port=port, access_log=web.access_logger if access_log else None)
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,202 @@
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+from alembic import command as alembic_command
+from alembic.config import Config
+from click.testing import CliRunner
+from sqlalchemy import event, select, text
+
+import cli as bookstore
+import db
+from db import create_engine
+import seeds
+from models import AuthorGenre, Book, Customer, Genre
+
+
+def _prepare_database(path, books, customers, orders, seed):
+    """Create and seed the benchmark database unless it already exists."""
+    url = f"sqlite:///{path}"
+    if not os.path.exists(path):
+        click.echo(f"Creating {path} ...", err=True)
+        root = os.path.dirname(os.path.abspath(__file__))
+        config = Config(os.path.join(root, 'alembic.ini'))
+        # alembic.ini's script_location is relative to the working directory; anchor it to the repo
+        config.set_main_option('script_location', os.path.join(root, 'alembic'))
+        config.attributes['database_url'] = url
+        alembic_command.upgrade(config, 'head')
+        seeds.generate(create_engine(url), books, customers, orders, seed, echo=lambda line: click.echo(line, err=True))
+    return create_engine(url)
+
+
+def _benchmark_commands(engine):
+    """The CLI invocations to time, with arguments picked from the dataset."""
+    with engine.connect() as connection:
+        book_id, title, price = connection.execute(
+            select(Book.book_id, Book.title, Book.price).order_by(Book.book_id).limit(1)
+        ).one()
+        last_book = connection.execute(select(Book.book_id).order_by(Book.book_id.desc()).limit(1)).scalar()
+        author = connection.execute(select(AuthorGenre.author_name).order_by(AuthorGenre.id).limit(1)).scalar()
+        genre = connection.execute(select(Genre.genre_name).order_by(Genre.id).limit(1)).scalar()
+        customer_id = connection.execute(select(Customer.customer_id).order_by(Customer.customer_id).limit(1)).scalar()
+        # Make sure the order benchmark never runs out of stock
+        connection.execute(text("UPDATE inventory SET quantity_in_stock = 1000000 WHERE book_id = :book_id"),
+                           {'book_id': book_id})
+        connection.commit()
+
+    word = title.split()[0]
+    middle = last_book // 2
+    return {
+        'search-books': ['search-books', word, '--limit', '20'],
+        'search-books-prefix': ['search-books', '--title', word[:3] + '*', '--limit', '20'],
+        'search-books-author': ['search-books', '--author', author.split()[0], '--genre', genre],
+        'list-books': ['list-books', '--limit', '1000'],
+        'list-books-deep-page': ['list-books', '--after', str(middle), '--limit', '1000'],
+        'list-books-count': ['list-books', '--count'],
+        'list-customers': ['list-customers', '--limit', '1000'],
+        'list-orders': ['list-orders', '--limit', '1000'],
+        'list-inventory': ['list-inventory', '--limit', '1000'],
+        'add-book': ['add-book', 'Benchmark Book', author, genre, '2024', '10.0', '5'],
+        'add-customer': ['add-customer', 'Benchmark Customer', 'bench@example.com', '0700000000'],
+        'update-book': ['update-book', str(book_id), title, author, genre, '2000', str(price), '1000000'],
+        'update-customer': ['update-customer', str(customer_id), 'bench@example.com', '0700000000'],
+        'add-order-item': ['add-order-item', str(customer_id), str(book_id), '2024-01-01', str(price), '1'],
+        'report-revenue': ['report', 'revenue', '--by', 'genre'],
+    }
+
+
+# Modules `cli.py --help` must not import; they are what made start-up slow
+STARTUP_FORBIDDEN_MODULES = ('sqlalchemy', 'models')
+
+
+def _measure_startup(repeat):
+    """Time `cli.py --help` in fresh interpreters, with -X importtime.
+
+    Returns the median wall time and import time in milliseconds and the
+    forbidden modules that were imported.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+    wall, imports, forbidden = [], [], set()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', script, '--help'],
+                                capture_output=True, text=True, check=True)
+        wall.append((time.perf_counter() - started) * 1000)
+        total = 0
+        # Lines look like "import time:   self [us] | cumulative | package"
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, _, module = line[len('import time:'):].split('|')
+            total += int(self_us)
+            module = module.strip()
+            if module.split('.')[0] in STARTUP_FORBIDDEN_MODULES:
+                forbidden.add(module.split('.')[0])
+        imports.append(total / 1000)
+    return {
+        'runs': repeat,
+        'median_ms': round(statistics.median(wall), 3),
+        'import_ms': round(statistics.median(imports), 3),
+        'forbidden_imports': sorted(forbidden),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.command()
+@click.option('--db', 'path', default='bench.db', show_default=True,
+              help="Benchmark database. Created and seeded if it does not exist.")
+@click.option('--books', type=seeds._count, default=100000, show_default=True)
+@click.option('--customers', type=seeds._count, default=20000, show_default=True)
+@click.option('--orders', type=seeds._count, default=500000, show_default=True)
+@click.option('--seed', type=int, default=42, show_default=True)
+@click.option('--repeat', type=click.IntRange(min=1), default=5, show_default=True, help="Timed runs per command.")
+@click.option('--only', multiple=True, help="Only run the named benchmark. Can be repeated.")
+@click.option('--output', type=click.Path(dir_okay=False), help="Write the JSON results here as well as to stdout.")
+@click.option('--startup-budget-ms', type=float, default=150, show_default=True,
+              help="Fail when the median import time of `cli.py --help` is above this.")
+def bench(path, books, customers, orders, seed, repeat, only, output, startup_budget_ms):
+    """Time every CLI command against a synthetic dataset and report JSON
+
+    The `startup` benchmark runs `cli.py --help` with -X importtime and fails
+    the run if it goes over --startup-budget-ms or imports SQLAlchemy. Use
+    `--only startup` to run just that check, without a database.
+    """
+    startup = None
+    if not only or 'startup' in only:
+        startup = _measure_startup(repeat)
+        click.echo(f"startup: {startup['median_ms']:.1f} ms, {startup['import_ms']:.1f} ms importing", err=True)
+
+    results = {}
+    if not only or set(only) - {'startup'}:
+        results = _run_commands(path, books, customers, orders, seed, repeat, only)
+
+    report = {
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'dataset': {'db': path, 'books': books, 'customers': customers, 'orders': orders, 'seed': seed},
+        'startup': startup and {**startup, 'budget_ms': startup_budget_ms},
+        'commands': results,
+    }
+    text_report = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as output_file:
+            output_file.write(text_report + "\n")
+    click.echo(text_report)
+
+    if startup and startup['forbidden_imports']:
+        raise click.ClickException(f"cli.py --help imported {', '.join(startup['forbidden_imports'])}")
+    if startup and startup['import_ms'] > startup_budget_ms:
+        raise click.ClickException(
+            f"cli.py --help spent {startup['import_ms']:.1f} ms importing, over the {startup_budget_ms:g} ms budget"
+        )
+
+
+def _run_commands(path, books, customers, orders, seed, repeat, only):
+    """Time each benchmark command against the dataset at ``path``."""
+    engine = _prepare_database(path, books, customers, orders, seed)
+
+    # Point the CLI at the benchmark database and count the SQL it sends
+    db.use_engine(engine)
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    runner = CliRunner()
+    results = {}
+    for name, args in _benchmark_commands(engine).items():
+        if only and name not in only:
+            continue
+        timings = []
+        for _ in range(repeat):
+            statements.clear()
+            started = time.perf_counter()
+            result = runner.invoke(bookstore.cli, args)
+            timings.append((time.perf_counter() - started) * 1000)
+            if result.exit_code != 0:
+                raise click.ClickException(f"{name} failed: {result.output}{result.exception!r}")
+        results[name] = {
+            'args': args,
+            'runs': repeat,
+            'median_ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'statements': len(statements),
+        }
+        click.echo(f"{name}: {results[name]['median_ms']:.1f} ms, {len(statements)} statements", err=True)
+    return results
+
+
+if __name__ == '__main__':
+    bench()
@@ -1,406 +1,87 @@
-import click
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base, AuthorGenre, Book, Genre, Customer, OrderItem
-from datetime import datetime
-from sqlalchemy.orm import joinedload
+import importlib
 
-# Actual database URL
-database_url = 'sqlite:///bookstore.db'
+import click
 
-# Create a database engine and bind it to the Base metadata
-engine = create_engine(database_url)
-Base.metadata.bind = engine
+# Every command with the module that defines it and its one-line help.
+# Modules are only imported when one of their commands runs, so `--help`
+# and the usage listing never import SQLAlchemy or the models.
+COMMANDS = {
+    'add-author': ('commands.books:add_author', "Add a new author to the bookstore"),
+    'add-book': ('commands.books:add_book', "Add a new book to the bookstore"),
+    'add-customer': ('commands.customers:add_customer', "Add a new customer to the bookstore"),
+    'add-genre': ('commands.books:add_genre', "Add a new genre to the bookstore"),
+    'add-order-item': ('commands.orders:add_order_item',
+                       "Add a new order item to the bookstore and take its QUANTITY out of stock"),
+    'archive-orders': ('commands.archive:archive_orders',
+                       "Move orders dated before --before into the archive database"),
+    'backup': ('commands.backup:backup', "Back up the database while it is in use"),
+    'bulk-delete-books': ('commands.books:bulk_delete_books', "Delete every book matching the filters, with its stock"),
+    'bulk-update-books': ('commands.books:bulk_update_books',
+                          "Change the price of every book matching the filters by a percentage"),
+    'cache-stats': ('commands.names:cache_stats', "Show hit and miss counts of the author and genre name caches"),
+    'customer-history': ('commands.customers:customer_history',
+                         "Show a customer's lifetime spend and their orders, newest first"),
+    'delete-book': ('commands.books:delete_book', "Delete a book from the bookstore"),
+    'delete-customer': ('commands.customers:delete_customer', "Delete a customer from the bookstore"),
+    'explain': ('commands.explain:explain', "Print the EXPLAIN QUERY PLAN of each built-in command's query"),
+    'export': ('commands.exporter:export', "Export a table as CSV, JSONL or Parquet"),
+    'import': ('commands.importer:import_data', "Bulk import books, customers or orders from a CSV or JSONL file"),
+    'list-books': ('commands.books:list_books', "List all books in the bookstore"),
+    'list-customers': ('commands.customers:list_customers', "List all customers in the bookstore"),
+    'list-inventory': ('commands.books:list_inventory', "List the inventory of books in the bookstore"),
+    'list-orders': ('commands.orders:list_orders', "List all customer orders in the bookstore"),
+    'place-orders': ('commands.orders:place_orders', "Place many orders at once, charging each book's current price"),
+    'recommend': ('commands.recommend:recommend',
+                  "Recommend books that customers also bought, for a book or a customer"),
+    'reorder-report': ('commands.reorder:reorder_report',
+                       "List the books that will run out soon and how many to reorder"),
+    'report': ('commands.reports:report', "Sales reports"),
+    'restore': ('commands.backup:restore', "Replace the live database with a verified backup"),
+    'search-books': ('commands.books:search_books', "Search books based on title, author, or genre."),
+    'serve': ('commands.server:serve', "Serve commands over a Unix domain socket"),
+    'shell': ('commands.server:shell', "Run commands interactively, reusing one database engine"),
+    'update-book': ('commands.books:update_book', "Update book information"),
+    'update-customer': ('commands.customers:update_customer', "Update customer information"),
+}
+
+
+class LazyGroup(click.Group):
+    """A group that imports each command's module the first time it is used."""
+
+    def list_commands(self, ctx):
+        return sorted(set(COMMANDS) | set(self.commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in COMMANDS:
+            module_name, attribute = COMMANDS[cmd_name][0].split(':')
+            self.add_command(getattr(importlib.import_module(module_name), attribute), cmd_name)
+        return self.commands.get(cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        # List the commands from COMMANDS rather than loading every module
+        names = self.list_commands(ctx)
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            command = self.commands.get(name) or click.Command(name, help=COMMANDS[name][1])
+            if not command.hidden:
+                rows.append((name, command.get_short_help_str(limit)))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
 
-# Create a session factory
-DBSession = sessionmaker(bind=engine)
 
 # Define the main CLI group
-@click.group()
-def cli():
+@click.group(cls=LazyGroup)
+@click.option('--profile', is_flag=True,
+              help="After the command, report its SQL statements, their timings and likely N+1 queries.")
+@click.option('--profile-output', type=click.Path(dir_okay=False),
+              help="Also write the profile to this file: a cProfile dump if it ends in .prof, else a JSON trace.")
+@click.pass_context
+def cli(ctx, profile, profile_output):
     """Bookstore Management System CLI"""
-
-# Command to list all books in the bookstore
-@cli.command()
-def list_books():
-    """List all books in the bookstore"""
-    session = DBSession()
-    books = session.query(Book).all()
-    session.close()
-    for book in books:
-        print(f"Book ID: {book.book_id}, Title: {book.title}, Author: {book.author_genre.author_name}, Genre: {book.genre.genre_name}")
-
-# Command to list all customers in the bookstore
-@cli.command()
-def list_customers():
-    """List all customers in the bookstore"""
-    session = DBSession()
-    customers = session.query(Customer).all()
-    session.close()
-    for customer in customers:
-        print(f"Customer ID: {customer.customer_id}, Name: {customer.customer_name}, Email: {customer.email}, Phone: {customer.phone}")
-
-# Command to add a new author to the bookstore
-@cli.command()
-@click.argument('author_name')
-def add_author(author_name):
-    """Add a new author to the bookstore"""
-    session = DBSession()
-    
-    # Create a new AuthorGenre instance
-    author = AuthorGenre(author_name=author_name)
-    
-    # Add the author to the session and commit the transaction
-    session.add(author)
-    session.commit()
-    
-    # Close the session and provide feedback
-    session.close()
-    click.echo(f"Author '{author_name}' added successfully!")
-
-# Command to add a new genre to the bookstore
-@cli.command()
-@click.argument('genre_name')
-def add_genre(genre_name):
-    """Add a new genre to the bookstore"""
-    session = DBSession()
-    
-    # Create a new Genre instance
-    genre = Genre(genre_name=genre_name)
-    
-    # Add the genre to the session and commit the transaction
-    session.add(genre)
-    session.commit()
-    
-    # Close the session and provide feedback
-    session.close()
-    click.echo(f"Genre '{genre_name}' added successfully!")
-
-# Command to list all customer orders with customer and book details
-@cli.command()
-def list_orders():
-    """List all customer orders in the bookstore"""
-    session = DBSession()
-    
-    # Query all order items and eagerly load associated customer and book data
-    orders = session.query(OrderItem).options(joinedload(OrderItem.customer), joinedload(OrderItem.book)).all()
-    
-    # Close the session
-    session.close()
-    
-    # Print order information
-    for order in orders:
-        print(f"Order ID: {order.order_id}, Customer ID: {order.customer.customer_id}, Book ID: {order.book.book_id}, Order Date: {order.order_date}, Total Amount: {order.total_amount}")
-
-# Command to search books by title, author, or genre
-@cli.command()
-@click.option("--title", help="Search books by title.")
-@click.option("--author", help="Search books by author name.")
-@click.option("--genre", help="Search books by genre name.")
-def search_books(title, author, genre):
-    """Search books based on title, author, or genre."""
-    session = DBSession()
-
-    # Create a query that selects books and eagerly loads author and genre data
-    query = session.query(Book).join(AuthorGenre).join(Genre)
-
-    # Add filters based on provided options
-    if title:
-        query = query.filter(Book.title.like(f"%{title}%"))
-
-    if author:
-        query = query.filter(AuthorGenre.author_name.like(f"%{author}%"))
-
-    if genre:
-        query = query.filter(Genre.genre_name.like(f"%{genre}%"))
-
-    # Execute the query and get the list of matching books
-    books = query.all()
-
-    # Close the session
-    session.close()
-
-    # Display the results or indicate no matching books found
-    if not books:
-        print("No matching books found.")
-    else:
-        print("Matching books:")
-        for book in books:
-            print(f"Book ID: {book.book_id}, Title: {book.title}, Author: {book.author_genre.author_name}, Genre: {book.genre.genre_name}")
-
-@cli.command()
-def list_books():
-    """List all books in the bookstore"""
-    session = DBSession()
-    
-    # Use joinedload to load the 'author' and 'genre' relationships in the same query
-    books = session.query(Book).options(joinedload(Book.author), joinedload(Book.genre)).all()
-    
-    session.close()
-    
-    for book in books:
-        # Now you can access the 'author' and 'genre' attributes without issues
-        print(f"Book ID: {book.book_id}, Title: {book.title}, Author: {book.author.author_name}, Genre: {book.genre.genre_name}")
-
-# Adding the book
-@cli.command()
-@click.argument('book_title')
-@click.argument('author_name')
-@click.argument('genre_name')
-@click.argument('publication_year', type=int)
-@click.argument('price', type=float)
-@click.argument('quantity_in_stock', type=int)
-def add_book(book_title, author_name, genre_name, publication_year, price, quantity_in_stock):
-    """Add a new book to the bookstore"""
-    session = DBSession()
-    
-    # Check if author and genre already exist in the database or create them if not
-    author = session.query(AuthorGenre).filter_by(author_name=author_name).first()
-    genre = session.query(Genre).filter_by(genre_name=genre_name).first()
-    
-    if author is None:
-        author = AuthorGenre(author_name=author_name)
-        session.add(author)
-    
-    if genre is None:
-        genre = Genre(genre_name=genre_name)
-        session.add(genre)
-
-    # Create a new book instance and add it to the session
-    book = Book(
-        title=book_title,
-        author=author,
-        genre=genre,
-        publication_year=publication_year,
-        price=price,
-    )
-    session.add(book)
-
-    # Create an order item for the book and set its quantity in stock
-    order_item = OrderItem(book=book, quantity_in_stock=quantity_in_stock)
-    session.add(order_item)
-
-    # Commit the changes and close the session
-    session.commit()
-    session.close()
-    
-    click.echo(f"Book '{book_title}' added successfully!")
-
-
-@cli.command()
-def list_inventory():
-    """List the inventory of books in the bookstore"""
-    session = DBSession()
-    books = session.query(Book).all()
-    session.close()
-    for book in books:
-        print(f"Book ID: {book.book_id}, Title: {book.title}, Quantity in Stock: {book.order_items[0].quantity_in_stock if book.order_items else 0}")
-
-@cli.command()
-@click.argument('customer_name')
-@click.argument('email')
-@click.argument('phone')
-def add_customer(customer_name, email, phone):
-    """Add a new customer to the bookstore"""
-    session = DBSession()
-    
-    customer = Customer(customer_name=customer_name, email=email, phone=phone)
-    session.add(customer)
-    session.commit()
-    
-    session.close()
-    click.echo(f"Customer '{customer_name}' added successfully!")
-
-@cli.command()
-@click.argument('book_title')
-@click.argument('author_name')
-@click.argument('genre_name')
-@click.argument('publication_year', type=int)
-@click.argument('price', type=float)
-@click.argument('quantity_in_stock', type=int)
-def add_book(book_title, author_name, genre_name, publication_year, price, quantity_in_stock):
-    """Add a new book to the bookstore"""
-    session = DBSession()
-    
-    # Check if author and genre already exist in the database
-    author = session.query(AuthorGenre).filter_by(author_name=author_name).first()
-    genre = session.query(Genre).filter_by(genre_name=genre_name).first()
-    
-    if author is None:
-        author = AuthorGenre(author_name=author_name)
-        session.add(author)
-        session.commit()
-    
-    if genre is None:
-        genre = Genre(genre_name=genre_name)
-        session.add(genre)
-        session.commit()
-    
-    book = Book(title=book_title, author_id=author.id, genre_id=genre.id, publication_year=publication_year, price=price, quantity_in_stock=quantity_in_stock)
-    session.add(book)
-    session.commit()
-    
-    session.close()
-    click.echo(f"Book '{book_title}' added successfully!")
-
-@cli.command()
-@click.argument('customer_id', type=int)
-@click.argument('email')
-@click.argument('phone')
-def update_customer(customer_id, email, phone):
-    """Update customer information"""
-    session = DBSession()
-    customer = session.query(Customer).filter_by(customer_id=customer_id).first()
-    
-    if customer:
-        customer.email = email
-        customer.phone = phone
-        session.commit()
-        session.close()
-        click.echo(f"Customer information updated successfully!")
-    else:
-        session.close()
-        click.echo(f"Customer with ID {customer_id} does not exist.")
-
-@cli.command()
-@click.argument('book_id', type=int)
-@click.argument('book_title')
-@click.argument('author_name')
-@click.argument('genre_name')
-@click.argument('publication_year', type=int)
-@click.argument('price', type=float)
-@click.argument('quantity_in_stock', type=int)
-def update_book(book_id, book_title, author_name, genre_name, publication_year, price, quantity_in_stock):
-    """Update book information"""
-    session = DBSession()
-    book = session.query(Book).filter_by(book_id=book_id).first()
-    
-    if book:
-        author_genre = session.query(AuthorGenre).filter_by(author_name=author_name, genre_name=genre_name).first()
-        if author_genre is None:
-            click.echo(f"Author '{author_name}' and Genre '{genre_name}' do not exist. Please add them first.")
-            return
-
-        book.title = book_title
-        book.author_id = author_genre.id
-        book.genre_id = author_genre.genre_id
-        book.publication_year = publication_year
-        book.price = price
-
-        order_item = session.query(OrderItem).filter_by(book_id=book_id).first()
-        if order_item:
-            order_item.quantity_in_stock = quantity_in_stock
-
-        session.commit()
-        session.close()
-        click.echo(f"Book information updated successfully!")
-    else:
-        session.close()
-        click.echo(f"Book with ID {book_id} does not exist.")
-
-@cli.command()
-@click.argument('customer_id', type=int)
-def delete_customer(customer_id):
-    """Delete a customer from the bookstore"""
-    session = DBSession()
-    customer = session.query(Customer).filter_by(customer_id=customer_id).first()
-    
-    if customer:
-        session.delete(customer)
-        session.commit()
-        session.close()
-        click.echo(f"Customer with ID {customer_id} deleted successfully!")
-    else:
-        session.close()
-        click.echo(f"Customer with ID {customer_id} does not exist.")
-@cli.command()
-@click.argument('customer_id', type=int)
-@click.argument('book_id', type=int)
-@click.argument('order_date')
-@click.argument('total_amount', type=float)
-@click.argument('quantity_in_stock', type=int)
-def add_order_item(customer_id, book_id, order_date, total_amount, quantity_in_stock):
-    """Add a new order item to the bookstore"""
-    session = DBSession()
-
-    # Check if the customer and book exist
-    customer = session.query(Customer).filter_by(customer_id=customer_id).first()
-    book = session.query(Book).filter_by(book_id=book_id).first()
-
-    if customer is None:
-        session.close()
-        click.echo(f"Customer with ID {customer_id} does not exist.")
-        return
-
-    if book is None:
-        session.close()
-        click.echo(f"Book with ID {book_id} does not exist.")
-        return
-
-    # Convert the order date to a datetime object
-    try:
-        order_date = datetime.strptime(order_date, '%Y-%m-%d')
-    except ValueError:
-        session.close()
-        click.echo("Invalid date format. Please use YYYY-MM-DD.")
-        return
-
-    order_item = OrderItem(
-        customer_id=customer_id,
-        book_id=book_id,
-        order_date=order_date,
-        total_amount=total_amount,
-        quantity_in_stock=quantity_in_stock,
-    )
-
-    session.add(order_item)
-    session.commit()
-    session.close()
-
-    click.echo("Order item added successfully!")
-
-
-@cli.command()
-@click.argument('book_id', type=int)
-def delete_book(book_id):
-    """Delete a book from the bookstore"""
-    session = DBSession()
-    book = session.query(Book).filter_by(book_id=book_id).first()
-    
-    if book:
-        session.delete(book)
-        session.commit()
-        session.close()
-        click.echo(f"Book with ID {book_id} deleted successfully!")
-    else:
-        session.close()
-        click.echo(f"Book with ID {book_id} does not exist.")
-
-@cli.command()
-def list_orders():
-    """List all customer orders in the bookstore"""
-    session = DBSession()
-    orders = session.query(OrderItem).all()
-    if not orders:
-        click.echo("No customer orders found.")
-        session.close()
-        return
-
-    for order in orders:
-        # Load the related customer and book objects within the same session
-        order = session.merge(order, load=False)  # Merge the detached object
-        customer = order.customer
-        book = order.book
-
-        print(f"Order ID: {order.order_id}")
-        print(f"Customer ID: {customer.customer_id}")
-        print(f"Book ID: {book.book_id}")
-        print(f"Order Date: {order.order_date}")
-        print(f"Total Amount: {order.total_amount}")
-        print(f"Quantity in Stock: {order.quantity_in_stock}")
-        print()
-
-    session.close()
+    if profile or profile_output:
+        from profiling import SQLProfiler
+        ctx.with_resource(SQLProfiler(ctx.invoked_subcommand, report=profile, output=profile_output))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,4 @@
+"""The CLI commands, one module per area.
+
+cli.py imports a module from here only when one of its commands runs.
+"""
@@ -0,0 +1,175 @@
+"""Order archival into a separate SQLite database, and queries that include it."""
+import os
+import re
+import time
+
+import click
+from sqlalchemy import MetaData, make_url, select, text, union_all
+from sqlalchemy.orm import aliased
+
+from db import database_url, get_engine, retry_on_lock, setting
+from models import Order, OrderLine
+
+# Tables moved to the archive, parents first
+ARCHIVED_TABLES = (Order.__table__, OrderLine.__table__)
+
+# The same tables in the attached archive database
+ARCHIVE_TABLES = {table.name: table.to_metadata(MetaData(), schema='archive') for table in ARCHIVED_TABLES}
+
+# Views over the live rows followed by the archived ones, for SQL that reads order history
+HISTORY_VIEWS = {'orders': 'order_history', 'order_line': 'order_line_history'}
+
+
+def archive_path():
+    """The archive database file: the archive_database setting, or <live database>_archive.db."""
+    path = setting('archive_database')
+    if path:
+        return path
+    root, extension = os.path.splitext(make_url(database_url).database)
+    return f"{root}_archive{extension or '.db'}"
+
+
+def attach_archive(connection):
+    """ATTACH the archive database to ``connection`` as ``archive``.
+
+    The file and its tables are created if they do not exist yet, from the
+    live database's own CREATE TABLE and CREATE INDEX statements, so the
+    archive has the same schema. SQLite cannot attach a database inside a
+    transaction, so this must run before the connection writes anything.
+    """
+    attached = {row[1] for row in connection.exec_driver_sql("PRAGMA database_list")}
+    if 'archive' not in attached:
+        connection.exec_driver_sql("ATTACH DATABASE ? AS archive", (archive_path(),))
+
+    existing = set(connection.exec_driver_sql("SELECT name FROM archive.sqlite_master").scalars())
+    for table in ARCHIVED_TABLES:
+        # Tables sort after indexes by type, so DESC creates the table first
+        schema = connection.execute(text(
+            "SELECT name, sql FROM main.sqlite_master "
+            "WHERE tbl_name = :table AND sql IS NOT NULL ORDER BY type DESC"
+        ), {'table': table.name})
+        for name, sql in schema:
+            if name not in existing:
+                connection.exec_driver_sql(re.sub(rf"\b(TABLE|INDEX) {re.escape(name)}\b",
+                                                  rf"\1 archive.{name}", sql, count=1))
+
+
+def create_history_views(connection):
+    """Create the HISTORY_VIEWS as temporary views on ``connection``.
+
+    They include the archive when its file exists and cover the live
+    tables alone otherwise, so SQL that reads them works either way. Run
+    this before the connection writes anything, as for attach_archive().
+    """
+    include_archive = os.path.exists(archive_path())
+    if include_archive:
+        attach_archive(connection)
+    for table in ARCHIVED_TABLES:
+        view = HISTORY_VIEWS[table.name]
+        columns = ", ".join(table.columns.keys())
+        sql = f"SELECT {columns} FROM main.{table.name}"
+        if include_archive:
+            sql += f" UNION ALL SELECT {columns} FROM archive.{table.name}"
+        connection.exec_driver_sql(f"DROP VIEW IF EXISTS temp.{view}")
+        connection.exec_driver_sql(f"CREATE TEMP VIEW {view} AS {sql}")
+
+
+def history_table(connection, table):
+    """A selectable of ``table``'s live rows UNION ALL its archived rows.
+
+    Like create_history_views(), this is the live table alone when there
+    is no archive file, rather than creating an empty archive to read.
+    """
+    if not os.path.exists(archive_path()):
+        return table
+    attach_archive(connection)
+    return union_all(select(table), select(ARCHIVE_TABLES[table.name])).subquery(HISTORY_VIEWS[table.name])
+
+
+def order_history(session):
+    """Order and OrderLine aliased to live and archived rows together, for --include-archive."""
+    connection = session.connection()
+    return (
+        aliased(Order, history_table(connection, Order.__table__)),
+        aliased(OrderLine, history_table(connection, OrderLine.__table__)),
+    )
+
+
+def _move_orders(connection, before, chunk_size):
+    """Move up to ``chunk_size`` orders dated before ``before``, with their lines, to the archive.
+
+    Returns the number of orders moved. In WAL mode a transaction over two
+    database files is atomic in each file but not across both, so rows are
+    copied with INSERT OR IGNORE: if a crash leaves some orders in both
+    databases, the next run finishes moving them.
+    """
+    # The newest order always stays live: SQLite gives a new row the highest
+    # id plus one, so emptying the table would hand out archived ids again
+    last_id = connection.execute(text(
+        "SELECT MAX(order_id) FROM ("
+        "SELECT order_id FROM main.orders WHERE order_date < :before "
+        "AND order_id < (SELECT MAX(order_id) FROM main.orders) ORDER BY order_id LIMIT :chunk_size)"
+    ), {'before': before, 'chunk_size': chunk_size}).scalar()
+    if last_id is None:
+        return 0
+
+    chunk = "SELECT order_id FROM main.orders WHERE order_id <= :last_id AND order_date < :before"
+    parameters = {'last_id': last_id, 'before': before}
+    orders, lines = (", ".join(table.columns.keys()) for table in ARCHIVED_TABLES)
+    connection.execute(text(
+        f"INSERT OR IGNORE INTO archive.orders ({orders}) SELECT {orders} FROM main.orders "
+        f"WHERE order_id IN ({chunk})"
+    ), parameters)
+    connection.execute(text(
+        f"INSERT OR IGNORE INTO archive.order_line ({lines}) SELECT {lines} FROM main.order_line "
+        f"WHERE order_id IN ({chunk})"
+    ), parameters)
+    connection.execute(text(f"DELETE FROM main.order_line WHERE order_id IN ({chunk})"), parameters)
+    return connection.execute(text(f"DELETE FROM main.orders WHERE order_id IN ({chunk})"), parameters).rowcount
+
+
+# Command to move old orders out of the live database
+@click.command()
+@click.option('--before', required=True, type=click.DateTime(formats=['%Y-%m-%d']),
+              help="Archive orders dated before this day.")
+@click.option('--chunk-size', type=click.IntRange(min=1), default=5000, show_default=True,
+              help="Orders moved per transaction.")
+def archive_orders(before, chunk_size):
+    """Move orders dated before --before into the archive database
+
+    Orders and their lines are moved in chunks, each in its own short
+    transaction, so tills can keep writing meanwhile. The freed pages are
+    then returned to the file system with an incremental VACUUM. Sales
+    rollups and customer summaries are left as they are; list-orders,
+    customer-history and export read archived orders with --include-archive.
+    """
+    before = before.date()
+    moved = 0
+    started = time.perf_counter()
+
+    def move_chunk():
+        with get_engine().begin() as connection:
+            attach_archive(connection)
+            return _move_orders(connection, before, chunk_size)
+
+    while True:
+        count = retry_on_lock(move_chunk)
+        if not count:
+            break
+        moved += count
+        click.echo(f"{moved} orders archived ({moved / (time.perf_counter() - started):.0f} orders/sec)", err=True)
+
+    with get_engine().connect() as connection:
+        free_pages = connection.exec_driver_sql("PRAGMA main.freelist_count").scalar()
+        if connection.exec_driver_sql("PRAGMA main.auto_vacuum").scalar() == 2:
+            # Return the free pages to the file system, then fold the WAL back in so the file shrinks.
+            # The pragma frees one page per step; executescript() runs it to completion.
+            connection.connection.driver_connection.executescript("PRAGMA main.incremental_vacuum")
+            connection.exec_driver_sql("PRAGMA main.wal_checkpoint(TRUNCATE)")
+            click.echo(f"Released {free_pages} free pages.")
+        else:
+            click.echo(f"{free_pages} free pages will be reused. Run the database migrations "
+                       f"to enable incremental vacuum and shrink the file.")
+
+    click.echo(f"Archived {moved} orders dated before {before} to {archive_path()} "
+               f"in {time.perf_counter() - started:.1f}s.")
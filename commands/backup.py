@@ -0,0 +1,229 @@
+"""Online backups, rotating snapshots and restores of the database."""
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import click
+from sqlalchemy import make_url
+
+from db import database_url, get_engine, setting
+
+# Bytes read at a time when checksumming a backup
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+# The Alembic configuration whose revisions a backup must be one of
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'alembic.ini')
+
+
+def _database_path():
+    return make_url(database_url).database
+
+
+def snapshot_dir():
+    """Where snapshots go: the backup_dir setting, or backups/ next to the database."""
+    return setting('backup_dir') or os.path.join(os.path.dirname(os.path.abspath(_database_path())), 'backups')
+
+
+def manifest_path(path):
+    """The JSON file recording a backup's checksum and Alembic revision."""
+    return f"{path}.json"
+
+
+def checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for block in iter(lambda: stream.read(CHECKSUM_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _revision(connection):
+    """The Alembic revision a database is at, or None before the first migration."""
+    try:
+        return connection.execute("SELECT version_num FROM alembic_version").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def _alembic_revisions():
+    """Every revision in alembic/versions, and the head."""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    # alembic.ini's script_location is relative to the working directory; anchor it to the repo
+    config = Config(ALEMBIC_INI)
+    config.set_main_option('script_location', os.path.join(os.path.dirname(ALEMBIC_INI), 'alembic'))
+    script = ScriptDirectory.from_config(config)
+    return {revision.revision for revision in script.walk_revisions()}, script.get_current_head()
+
+
+def _copy_pages(source, target, pages):
+    """Copy ``source`` into ``target`` with the SQLite online backup API.
+
+    Each step copies ``pages`` pages inside a short read transaction, so
+    writers only wait for one step at a time. If another connection
+    writes to the source meanwhile, SQLite restarts the copy from the
+    first page; the progress shown on stderr then starts over.
+    """
+    started = time.perf_counter()
+
+    def progress(status, remaining, total):
+        if total:
+            click.echo(f"\r{total - remaining}/{total} pages copied", nl=False, err=True)
+
+    source.backup(target, pages=pages, progress=progress)
+    click.echo(f" in {time.perf_counter() - started:.1f}s.", err=True)
+
+
+def backup_database(path, pages):
+    """Back the live database up to ``path`` and write its manifest. Returns the manifest.
+
+    The copy is made under a temporary name and renamed into place when
+    complete, and it is switched to a rollback journal, so a backup is
+    always one self-contained file.
+    """
+    partial = f"{path}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    raw = get_engine().raw_connection()
+    target = sqlite3.connect(partial)
+    try:
+        _copy_pages(raw.driver_connection, target, pages)
+        target.execute("PRAGMA journal_mode = DELETE")
+        revision = _revision(target)
+    finally:
+        target.close()
+        raw.close()
+    os.replace(partial, path)
+
+    manifest = {
+        'file': os.path.basename(path),
+        'source': os.path.abspath(_database_path()),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'size': os.path.getsize(path),
+        'sha256': checksum(path),
+        'revision': revision,
+    }
+    with open(manifest_path(path), 'w') as stream:
+        json.dump(manifest, stream, indent=2)
+    return manifest
+
+
+def _rotate(directory, stem, keep):
+    """Delete all but the newest ``keep`` snapshots of ``stem`` in ``directory``. Returns the deleted paths."""
+    # Snapshot names end in a sortable timestamp, so name order is age order
+    snapshots = sorted(glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(stem)}-*.db")))
+    expired = snapshots[:-keep]
+    for path in expired:
+        for name in (path, manifest_path(path)):
+            if os.path.exists(name):
+                os.remove(name)
+    return expired
+
+
+def verify_backup(path):
+    """Check a backup against its manifest. Returns the manifest; raises ClickException on any mismatch.
+
+    The checksum, the Alembic revision stored in the backup and SQLite's
+    integrity check must all agree with the manifest, and the revision
+    must be one from alembic/versions.
+    """
+    try:
+        with open(manifest_path(path)) as stream:
+            manifest = json.load(stream)
+    except FileNotFoundError:
+        raise click.ClickException(f"{path} has no manifest ({manifest_path(path)}).")
+
+    if checksum(path) != manifest['sha256']:
+        raise click.ClickException(f"{path} does not match the checksum in its manifest.")
+
+    connection = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        revision = _revision(connection)
+        integrity = connection.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        connection.close()
+    if revision != manifest['revision']:
+        raise click.ClickException(f"{path} is at revision {revision}, but its manifest says {manifest['revision']}.")
+    if integrity != 'ok':
+        raise click.ClickException(f"{path} failed the integrity check: {integrity}")
+
+    revisions, _ = _alembic_revisions()
+    if revision not in revisions:
+        raise click.ClickException(f"{path} is at revision {revision}, which is not in alembic/versions; "
+                                   f"it was made by a newer version of the bookstore.")
+    return manifest
+
+
+# Command to back up the live database
+@click.command()
+@click.option('--to', 'path', type=click.Path(dir_okay=False), help="File to write the backup to.")
+@click.option('--snapshot', is_flag=True,
+              help="Write a timestamped snapshot to the snapshot directory and delete the oldest ones.")
+@click.option('--keep', type=click.IntRange(min=1), default=7, show_default=True,
+              help="Snapshots to keep with --snapshot.")
+@click.option('--pages', type=click.IntRange(min=1), default=1024, show_default=True,
+              help="Pages copied per step.")
+def backup(path, snapshot, keep, pages):
+    """Back up the database while it is in use
+
+    The copy is made with SQLite's online backup API, a few pages at a
+    time, so writers are only paused briefly. Next to each backup a
+    .json manifest records its SHA-256 checksum and Alembic revision,
+    which restore checks.
+    """
+    if bool(path) == snapshot:
+        raise click.UsageError("Give either --to or --snapshot.")
+
+    if snapshot:
+        directory = snapshot_dir()
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(_database_path()))[0]
+        path = os.path.join(directory, f"{stem}-{datetime.now():%Y%m%d-%H%M%S-%f}.db")
+
+    manifest = backup_database(path, pages)
+    click.echo(f"Backed up {manifest['size']} bytes at revision {manifest['revision']} to {path} "
+               f"(sha256 {manifest['sha256'][:12]}).")
+
+    if snapshot:
+        for expired in _rotate(directory, stem, keep):
+            click.echo(f"Deleted old snapshot {expired}.")
+
+
+# Command to put a backup back in place of the live database
+@click.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--verify-only', is_flag=True, help="Only check the backup against its manifest.")
+@click.option('--yes', is_flag=True, help="Do not ask before replacing the live database.")
+def restore(path, verify_only, yes):
+    """Replace the live database with a verified backup
+
+    The backup's checksum, Alembic revision and integrity are checked
+    against its manifest first. It is then copied over the live database
+    with the online backup API, so other connections see either the old
+    database or the restored one.
+    """
+    manifest = verify_backup(path)
+    click.echo(f"{path} is intact: revision {manifest['revision']}, taken {manifest['created']}.")
+    if verify_only:
+        return
+    if not yes:
+        click.confirm(f"Replace {_database_path()} with this backup?", abort=True)
+
+    source = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    raw = get_engine().raw_connection()
+    try:
+        _copy_pages(source, raw.driver_connection, -1)
+    finally:
+        raw.close()
+        source.close()
+
+    _, head = _alembic_revisions()
+    click.echo(f"Restored {path}.")
+    if manifest['revision'] != head:
+        click.echo(f"The backup is at revision {manifest['revision']}; run 'alembic upgrade head' to migrate it.")
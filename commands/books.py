@@ -0,0 +1,599 @@
+"""Commands for books, authors, genres and stock."""
+import re
+
+import click
+from sqlalchemy import column, delete, func, literal_column, select, table, text, update
+from sqlalchemy.exc import IntegrityError
+
+from commands.catalog import CATALOG
+from commands.common import check_version, commit_versioned, next_page_hint, paginate, pagination_options
+from commands.fuzzy import DUPLICATE_AUTHOR_THRESHOLD, similar, similarity
+from commands.names import AUTHOR_IDS, GENRE_IDS
+from db import DBSession, retry_on_lock
+from models import AuthorGenre, Book, Genre, Inventory, OrderLine
+
+
+def book_list_query(session):
+    return (
+        session.query(Book.book_id, Book.title, AuthorGenre.author_name, Genre.genre_name, Book.version)
+        .outerjoin(Book.author)
+        .outerjoin(Book.genre)
+    )
+
+
+def inventory_list_query(session):
+    return (
+        session.query(Book.book_id, Book.title, func.coalesce(Inventory.quantity_in_stock, 0), Inventory.version)
+        .outerjoin(Book.inventory)
+    )
+
+
+# Command to list all books in the bookstore
+@click.command()
+@pagination_options
+def list_books(after, limit, count):
+    """List all books in the bookstore"""
+    session = DBSession()
+    books = paginate(book_list_query(session), Book.book_id, after, limit, count)
+    if count:
+        session.close()
+        print(books)
+        return
+
+    shown = 0
+    for book_id, title, author_name, genre_name, version in books:
+        shown += 1
+        print(f"Book ID: {book_id}, Title: {title}, Author: {author_name}, Genre: {genre_name}, Version: {version}")
+    session.close()
+    next_page_hint(shown, limit, book_id if shown else after)
+
+
+def _warn_similar_authors(session, author_name):
+    """Warn when a new author's name is very like an existing author's."""
+    matches = [
+        f"'{name}' (ID {author_id})"
+        for author_id, name, _ in similar(session, 'author', author_name, DUPLICATE_AUTHOR_THRESHOLD, similarity)
+        if name != author_name
+    ]
+    if matches:
+        click.echo(f"Warning: author '{author_name}' looks like {', '.join(matches[:3])}; "
+                   f"check for a typo before adding books under both names.", err=True)
+
+
+# Command to add a new author to the bookstore
+@click.command()
+@click.argument('author_name')
+def add_author(author_name):
+    """Add a new author to the bookstore"""
+    session = DBSession()
+    
+    # Create a new AuthorGenre instance
+    author = AuthorGenre(author_name=author_name)
+    
+    # Add the author to the session and commit the transaction
+    session.add(author)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.close()
+        click.echo(f"Author '{author_name}' already exists.")
+        return
+    
+    # Close the session and provide feedback
+    _warn_similar_authors(session, author_name)
+    session.close()
+    click.echo(f"Author '{author_name}' added successfully!")
+
+
+# Command to add a new genre to the bookstore
+@click.command()
+@click.argument('genre_name')
+def add_genre(genre_name):
+    """Add a new genre to the bookstore"""
+    session = DBSession()
+    
+    # Create a new Genre instance
+    genre = Genre(genre_name=genre_name)
+    
+    # Add the genre to the session and commit the transaction
+    session.add(genre)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.close()
+        click.echo(f"Genre '{genre_name}' already exists.")
+        return
+    
+    # Close the session and provide feedback
+    session.close()
+    click.echo(f"Genre '{genre_name}' added successfully!")
+
+
+SEARCH_BOOKS_SQL = text(
+    "SELECT rowid, title, author_name, genre_name FROM book_fts "
+    "WHERE book_fts MATCH :match ORDER BY rank LIMIT :limit"
+)
+
+
+def _fts_terms(value):
+    """Turn user input into an FTS5 expression.
+
+    Bare words are quoted so punctuation such as "F. Scott" is never parsed
+    as query syntax, a trailing ``*`` keeps prefix matching ("gats*") and
+    double-quoted input is kept together as a phrase ("great gatsby").
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', value):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word.endswith('*') and word.rstrip('*'):
+            terms.append('"' + word.rstrip('*').replace('"', '""') + '"*')
+        elif word.strip('*'):
+            terms.append('"' + word.replace('"', '""') + '"')
+    return " ".join(terms)
+
+
+def fts_match(query, title, author, genre):
+    """Build the MATCH expression for the book_fts index."""
+    parts = []
+    for column, value in ((None, query), ("title", title), ("author_name", author), ("genre_name", genre)):
+        terms = _fts_terms(value) if value else ""
+        if terms:
+            parts.append(f"{column} : ({terms})" if column else f"({terms})")
+    return " AND ".join(parts)
+
+
+# The full-text index as a table, for searches that also filter on book columns
+BOOK_FTS = table('book_fts', column('rowid'), column('title'), column('author_name'), column('genre_name'))
+
+# Orderings offered by search-books --sort. Ties are broken by book ID, so
+# each ordering is exactly the order of the book.price or
+# book.publication_year index, which ends in the book ID.
+SEARCH_SORTS = {
+    'price': (Book.price, False),
+    'price-desc': (Book.price, True),
+    'year': (Book.publication_year, False),
+    'year-desc': (Book.publication_year, True),
+}
+
+
+def book_search_statement(match, min_price, max_price, year_from, year_to, sort, limit):
+    """A search with price and year ranges, returning ID, title, author, genre, year and price.
+
+    With a MATCH expression the full-text index is searched and joined to
+    book by rowid; without one, book is read through its price or year
+    index. Results are ranked best match first, or in book ID order, unless
+    ``sort`` names one of SEARCH_SORTS. Books without a price or year are
+    left out when sorting by it.
+    """
+    if match:
+        statement = (
+            select(BOOK_FTS.c.rowid, BOOK_FTS.c.title, BOOK_FTS.c.author_name, BOOK_FTS.c.genre_name,
+                   Book.publication_year, Book.price)
+            .join_from(BOOK_FTS, Book, Book.book_id == BOOK_FTS.c.rowid)
+            .where(literal_column('book_fts').op('MATCH')(match))
+        )
+    else:
+        statement = (
+            select(Book.book_id, Book.title, AuthorGenre.author_name, Genre.genre_name,
+                   Book.publication_year, Book.price)
+            .outerjoin(Book.author)
+            .outerjoin(Book.genre)
+        )
+
+    for book_column, low, high in ((Book.price, min_price, max_price), (Book.publication_year, year_from, year_to)):
+        if low is not None:
+            statement = statement.where(book_column >= low)
+        if high is not None:
+            statement = statement.where(book_column <= high)
+    if sort in SEARCH_SORTS:
+        book_column, descending = SEARCH_SORTS[sort]
+        keys = (book_column, Book.book_id)
+        statement = statement.where(book_column.isnot(None))
+        statement = statement.order_by(*(key.desc() for key in keys) if descending else keys)
+    else:
+        statement = statement.order_by(literal_column('rank') if match else Book.book_id)
+    return statement.limit(limit)
+
+
+def _fuzzy_search(session, query, title, author, limit):
+    """Rank books by trigram similarity of their title and author to the search.
+
+    QUERY is compared with both titles and author names, --title with
+    titles and --author with author names; a book must match every option
+    given and scores the sum of its best similarities. Returns rows of
+    ``book_search_statement()`` with the score appended.
+    """
+    scores = []
+    for value, kinds in ((query, ('title', 'author')), (title, ('title',)), (author, ('author',))):
+        if not value:
+            continue
+        book_scores = {}
+        for kind in kinds:
+            matches = similar(session, kind, value)
+            if kind == 'title':
+                pairs = [(book_id, score) for book_id, _, score in matches]
+            else:
+                author_scores = {author_id: score for author_id, _, score in matches}
+                pairs = [
+                    (book_id, author_scores[author_id])
+                    for book_id, author_id in session.execute(
+                        select(Book.book_id, Book.author_id).where(Book.author_id.in_(author_scores))
+                    )
+                ]
+            for book_id, score in pairs:
+                book_scores[book_id] = max(score, book_scores.get(book_id, 0))
+        scores.append(book_scores)
+
+    totals = {
+        book_id: sum(book_scores[book_id] for book_scores in scores)
+        for book_id in set.intersection(*(set(book_scores) for book_scores in scores))
+    }
+    best = sorted(totals, key=lambda book_id: (-totals[book_id], book_id))[:limit]
+    if not best:
+        return []
+    rows = {
+        row[0]: row for row in session.execute(
+            book_search_statement(None, None, None, None, None, None, len(best)).where(Book.book_id.in_(best))
+        )
+    }
+    return [(*rows[book_id], totals[book_id]) for book_id in best if book_id in rows]
+
+
+def _snapshot_search(session, min_price, max_price, year_from, year_to, sort, limit):
+    """Answer a range search from the catalog snapshot, reading only the books shown."""
+    book_ids = CATALOG.search(session, min_price, max_price, year_from, year_to, sort, limit)
+    if not book_ids:
+        return []
+    rows = {
+        row[0]: row for row in session.execute(
+            book_search_statement(None, None, None, None, None, None, len(book_ids))
+            .where(Book.book_id.in_(book_ids))
+        )
+    }
+    return [rows[book_id] for book_id in book_ids if book_id in rows]
+
+
+# Command to search books by title, author, or genre
+@click.command()
+@click.argument("query", required=False)
+@click.option("--title", help="Search books by title.")
+@click.option("--author", help="Search books by author name.")
+@click.option("--genre", help="Search books by genre name.")
+@click.option("--min-price", type=float, help="Only books costing at least this.")
+@click.option("--max-price", type=float, help="Only books costing at most this.")
+@click.option("--year-from", type=int, help="Only books published in or after this year.")
+@click.option("--year-to", type=int, help="Only books published in or before this year.")
+@click.option("--sort", type=click.Choice(['relevance', *SEARCH_SORTS]),
+              help="Order of the results. Defaults to best match first, or book ID without a search query.")
+@click.option("--fuzzy", is_flag=True,
+              help="Match QUERY, --title and --author by trigram similarity, tolerating typos.")
+@click.option("--limit", type=click.IntRange(min=1), default=20, show_default=True, help="Maximum number of books to show.")
+def search_books(query, title, author, genre, min_price, max_price, year_from, year_to, sort, fuzzy, limit):
+    """Search books based on title, author, or genre.
+
+    QUERY is matched against all three fields. Words ending in * match as
+    prefixes and "quoted words" match as a phrase. Results are ranked best
+    match first.
+
+    --min-price, --max-price, --year-from and --year-to narrow the results,
+    or browse the whole catalog when no QUERY is given, and --sort orders
+    them by price or year.
+
+    --fuzzy finds titles and authors that are spelt differently, ranked by
+    how many three-letter runs they share with the search.
+    """
+    if fuzzy:
+        if genre or sort is not None or any(value is not None for value in (min_price, max_price, year_from, year_to)):
+            click.echo("--fuzzy only works with a search query, --title and --author.")
+            return
+        if not (query or title or author):
+            click.echo("Please provide a search query, --title or --author.")
+            return
+        session = DBSession()
+        books = _fuzzy_search(session, query, title, author, limit)
+        session.close()
+        if not books:
+            print("No matching books found.")
+            return
+        print("Matching books:")
+        for book_id, book_title, author_name, genre_name, publication_year, price, score in books:
+            print(f"Book ID: {book_id}, Title: {book_title}, Author: {author_name}, Genre: {genre_name}, "
+                  f"Score: {score:.2f}")
+        return
+
+    match = fts_match(query, title, author, genre)
+    ranged = sort is not None or any(value is not None for value in (min_price, max_price, year_from, year_to))
+    if not match and not ranged:
+        click.echo("Please provide a search query, --title, --author, --genre, a price or year range, or --sort.")
+        return
+
+    session = DBSession()
+
+    if not ranged:
+        # Query the full-text index directly; it already holds the author and
+        # genre names so no join back to the base tables is needed
+        books = session.execute(SEARCH_BOOKS_SQL, {"match": match, "limit": limit}).all()
+    elif CATALOG.enabled and not match:
+        books = _snapshot_search(session, min_price, max_price, year_from, year_to, sort, limit)
+    else:
+        books = session.execute(
+            book_search_statement(match, min_price, max_price, year_from, year_to, sort, limit)
+        ).all()
+
+    # Close the session
+    session.close()
+
+    # Display the results or indicate no matching books found
+    if not books:
+        print("No matching books found.")
+    elif not ranged:
+        print("Matching books:")
+        for book_id, book_title, author_name, genre_name in books:
+            print(f"Book ID: {book_id}, Title: {book_title}, Author: {author_name}, Genre: {genre_name}")
+    else:
+        print("Matching books:")
+        for book_id, book_title, author_name, genre_name, publication_year, price in books:
+            print(f"Book ID: {book_id}, Title: {book_title}, Author: {author_name}, Genre: {genre_name}, "
+                  f"Year: {publication_year}, Price: {price}")
+
+
+# Adding the book
+@click.command()
+@click.argument('book_title')
+@click.argument('author_name')
+@click.argument('genre_name')
+@click.argument('publication_year', type=int)
+@click.argument('price', type=float)
+@click.argument('quantity_in_stock', type=int)
+def add_book(book_title, author_name, genre_name, publication_year, price, quantity_in_stock):
+    """Add a new book to the bookstore"""
+    session = DBSession()
+    
+    # Check if author and genre already exist in the database
+    author_id = AUTHOR_IDS.get(session, author_name)
+    genre_id = GENRE_IDS.get(session, genre_name)
+
+    # Warn before anything is added: the lookup would otherwise autoflush the
+    # book without its author and update it again at commit
+    if author_id is None:
+        _warn_similar_authors(session, author_name)
+
+    # Create a new book instance and add it to the session
+    book = Book(
+        title=book_title,
+        author_id=author_id,
+        genre_id=genre_id,
+        publication_year=publication_year,
+        price=price,
+    )
+    session.add(book)
+
+    # Create the author and genre along with the book if they are new
+    if author_id is None:
+        book.author = AuthorGenre(author_name=author_name)
+    if genre_id is None:
+        book.genre = Genre(genre_name=genre_name)
+
+    # Create the book's stock row
+    book.inventory = Inventory(quantity_in_stock=quantity_in_stock)
+
+    # Commit the changes and close the session
+    session.commit()
+    session.close()
+    
+    click.echo(f"Book '{book_title}' added successfully!")
+
+
+@click.command()
+@pagination_options
+def list_inventory(after, limit, count):
+    """List the inventory of books in the bookstore"""
+    session = DBSession()
+
+    books = paginate(inventory_list_query(session), Book.book_id, after, limit, count)
+    if count:
+        session.close()
+        print(books)
+        return
+
+    shown = 0
+    for book_id, title, quantity_in_stock, stock_version in books:
+        shown += 1
+        print(f"Book ID: {book_id}, Title: {title}, Quantity in Stock: {quantity_in_stock}, "
+              f"Stock Version: {stock_version}")
+    session.close()
+    next_page_hint(shown, limit, book_id if shown else after)
+
+
+@click.command()
+@click.argument('book_id', type=int)
+@click.argument('book_title')
+@click.argument('author_name')
+@click.argument('genre_name')
+@click.argument('publication_year', type=int)
+@click.argument('price', type=float)
+@click.argument('quantity_in_stock', type=int)
+@click.option('--expect-version', type=int, help="Only update the book if it is still at this version.")
+@click.option('--expect-stock-version', type=int, help="Only update the stock if it is still at this version.")
+def update_book(book_id, book_title, author_name, genre_name, publication_year, price, quantity_in_stock,
+                expect_version, expect_stock_version):
+    """Update book information
+
+    The book and its stock row are only written if no one else changed
+    them since they were read, or since the versions given with
+    --expect-version and --expect-stock-version (see list-books and
+    list-inventory). Otherwise nothing is saved and the command exits
+    with status 3.
+    """
+    session = DBSession()
+    book = session.query(Book).filter_by(book_id=book_id).first()
+    
+    if book:
+        check_version(session, f"Book {book_id}", book.version, expect_version)
+        check_version(session, f"The stock of book {book_id}",
+                      book.inventory.version if book.inventory else None, expect_stock_version)
+        author_id = AUTHOR_IDS.get(session, author_name)
+        genre_id = GENRE_IDS.get(session, genre_name)
+        if author_id is None or genre_id is None:
+            session.close()
+            click.echo(f"Author '{author_name}' and Genre '{genre_name}' do not exist. Please add them first.")
+            return
+
+        book.title = book_title
+        book.author_id = author_id
+        book.genre_id = genre_id
+        book.publication_year = publication_year
+        book.price = price
+
+        if book.inventory is None:
+            book.inventory = Inventory()
+        book.inventory.quantity_in_stock = quantity_in_stock
+
+        version = commit_versioned(session, f"Book {book_id}", book)
+        session.close()
+        click.echo(f"Book information updated successfully! (version {version})")
+    else:
+        session.close()
+        click.echo(f"Book with ID {book_id} does not exist.")
+
+
+@click.command()
+@click.argument('book_id', type=int)
+def delete_book(book_id):
+    """Delete a book from the bookstore"""
+    session = DBSession()
+    book = session.query(Book).filter_by(book_id=book_id).first()
+    
+    if book:
+        session.delete(book)
+        session.commit()
+        session.close()
+        click.echo(f"Book with ID {book_id} deleted successfully!")
+    else:
+        session.close()
+        click.echo(f"Book with ID {book_id} does not exist.")
+
+
+def book_filter_options(command):
+    """Add the options that pick the books for bulk-update-books and bulk-delete-books."""
+    command = click.option('--out-of-stock', is_flag=True, help="Only books with no copies in stock.")(command)
+    command = click.option('--max-price', type=float, help="Only books costing at most this.")(command)
+    command = click.option('--min-price', type=float, help="Only books costing at least this.")(command)
+    command = click.option('--year-before', type=int, help="Only books published before this year.")(command)
+    command = click.option('--author', help="Only books by this author.")(command)
+    command = click.option('--genre', help="Only books in this genre.")(command)
+    return command
+
+
+def book_filters(session, genre, author, year_before, min_price, max_price, out_of_stock):
+    """WHERE conditions on book for the book filter options.
+
+    Author and genre names are resolved to IDs first, so the conditions
+    only use book's own indexed columns. Raises UsageError when no filter
+    is given, so a bulk command never touches every book by accident, and
+    ClickException for an unknown author or genre.
+    """
+    conditions = []
+    for name, ids, label, key in ((author, AUTHOR_IDS, 'Author', Book.author_id),
+                                  (genre, GENRE_IDS, 'Genre', Book.genre_id)):
+        if name is not None:
+            row_id = ids.get(session, name)
+            if row_id is None:
+                raise click.ClickException(f"{label} '{name}' does not exist.")
+            conditions.append(key == row_id)
+    if year_before is not None:
+        conditions.append(Book.publication_year < year_before)
+    if min_price is not None:
+        conditions.append(Book.price >= min_price)
+    if max_price is not None:
+        conditions.append(Book.price <= max_price)
+    if out_of_stock:
+        in_stock = select(Inventory.book_id).where(Inventory.quantity_in_stock > 0)
+        conditions.append(Book.book_id.not_in(in_stock))
+    if not conditions:
+        raise click.UsageError("Give at least one of --genre, --author, --year-before, "
+                               "--min-price, --max-price or --out-of-stock.")
+    return conditions
+
+
+def _count_books(session, conditions):
+    return session.execute(select(func.count()).select_from(Book).where(*conditions)).scalar()
+
+
+# Command to change the price of many books at once
+@click.command()
+@book_filter_options
+@click.option('--price-pct', type=float, required=True,
+              help="Percentage to change prices by, e.g. 5 or -10. Prices are rounded to cents.")
+@click.option('--dry-run', is_flag=True, help="Only report how many books would change.")
+def bulk_update_books(genre, author, year_before, min_price, max_price, out_of_stock, price_pct, dry_run):
+    """Change the price of every book matching the filters by a percentage
+
+    The books are repriced with a single UPDATE ... WHERE, without loading
+    them, and their versions are bumped as for update-book.
+    """
+    session = DBSession()
+    conditions = book_filters(session, genre, author, year_before, min_price, max_price, out_of_stock)
+    if dry_run:
+        books = _count_books(session, conditions)
+        session.close()
+        click.echo(f"Would reprice {books} books by {price_pct:+g}%.")
+        return
+
+    def reprice():
+        result = session.execute(
+            update(Book).where(*conditions)
+            .values(price=func.round(Book.price * (1 + price_pct / 100), 2), version=Book.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return result.rowcount
+
+    books = retry_on_lock(reprice, rollback=session.rollback)
+    session.close()
+    CATALOG.invalidate()
+    click.echo(f"Repriced {books} books by {price_pct:+g}%.")
+
+
+# Command to delete many books at once
+@click.command()
+@book_filter_options
+@click.option('--dry-run', is_flag=True, help="Only report how many rows would change.")
+def bulk_delete_books(genre, author, year_before, min_price, max_price, out_of_stock, dry_run):
+    """Delete every book matching the filters, with its stock
+
+    Order lines for the books are kept for the sales history, with their
+    book ID cleared as delete-book does. The lines, the stock rows and the
+    books are each changed by one statement, all in one transaction.
+    """
+    session = DBSession()
+    conditions = book_filters(session, genre, author, year_before, min_price, max_price, out_of_stock)
+    book_ids = select(Book.book_id).where(*conditions)
+    if dry_run:
+        books = _count_books(session, conditions)
+        lines = session.execute(
+            select(func.count()).select_from(OrderLine).where(OrderLine.book_id.in_(book_ids))
+        ).scalar()
+        session.close()
+        click.echo(f"Would delete {books} books and their stock, and detach {lines} order lines.")
+        return
+
+    def purge():
+        lines = session.execute(
+            update(OrderLine).where(OrderLine.book_id.in_(book_ids)).values(book_id=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.execute(
+            delete(Inventory).where(Inventory.book_id.in_(book_ids)).execution_options(synchronize_session=False)
+        )
+        books = session.execute(
+            delete(Book).where(*conditions).execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+        return books, lines
+
+    books, lines = retry_on_lock(purge, rollback=session.rollback)
+    session.close()
+    CATALOG.invalidate()
+    click.echo(f"Deleted {books} books and their stock, and detached {lines} order lines.")
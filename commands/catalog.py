@@ -0,0 +1,87 @@
+"""In-process columnar snapshot of the catalog for price and year browsing."""
+import time
+
+import click
+from sqlalchemy import event, select
+
+from db import setting
+from models import Book
+
+
+class CatalogSnapshot:
+    """NumPy arrays of every book's id, price and publication year.
+
+    Long-running processes (the shell and the server) can answer repeated
+    price and year range queries from these arrays instead of SQLite. The
+    arrays are loaded with one query on first use and reloaded once they
+    are older than the ``catalog_snapshot_ttl`` setting, or as soon as a
+    book is added, changed or deleted through the ORM in this process.
+    Missing prices and years are NaN, so range filters and sorts skip them
+    just as the SQL query does.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.ids = self.prices = self.years = None
+        self.loaded_at = 0.0
+        self.loads = 0
+        for event_name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(Book, event_name, self._invalidate)
+
+    def enable(self):
+        """Use the snapshot for search-books from now on in this process."""
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            raise click.ClickException("The catalog snapshot needs NumPy: pip install numpy")
+        self.enabled = True
+
+    def invalidate(self):
+        self.ids = self.prices = self.years = None
+
+    def _invalidate(self, mapper, connection, target):
+        self.invalidate()
+
+    def _load(self, executor):
+        import numpy as np
+
+        rows = executor.execute(
+            select(Book.book_id, Book.price, Book.publication_year).order_by(Book.book_id)
+        ).all()
+        self.ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self.prices = np.array([row[1] for row in rows], dtype=np.float64)
+        self.years = np.array([row[2] for row in rows], dtype=np.float64)
+        self.loaded_at = time.monotonic()
+        self.loads += 1
+
+    def search(self, executor, min_price, max_price, year_from, year_to, sort, limit):
+        """Return the ids of the matching books in ``sort`` order, at most ``limit`` of them.
+
+        ``sort`` is one of the search-books sorts; books are in id order
+        otherwise and ties are broken by id, as in book_search_statement().
+        """
+        import numpy as np
+
+        if self.ids is None or time.monotonic() - self.loaded_at > setting('catalog_snapshot_ttl'):
+            self._load(executor)
+
+        mask = np.ones(len(self.ids), dtype=bool)
+        for values, low, high in ((self.prices, min_price, max_price), (self.years, year_from, year_to)):
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        sort_values = {'price': self.prices, 'year': self.years}.get(sort.split('-')[0]) if sort else None
+        if sort_values is not None:
+            mask &= ~np.isnan(sort_values)
+        matches = np.flatnonzero(mask)
+
+        if sort_values is not None:
+            # A stable sort keeps id order among equal values
+            matches = matches[np.argsort(sort_values[matches], kind='stable')]
+            if sort.endswith('-desc'):
+                matches = matches[::-1]
+        return self.ids[matches[:limit]].tolist()
+
+
+CATALOG = CatalogSnapshot()
@@ -0,0 +1,76 @@
+"""Helpers shared by the command modules."""
+import click
+from sqlalchemy import func
+from sqlalchemy.orm.exc import StaleDataError
+
+
+# Rows fetched per round trip when streaming list results
+STREAM_BATCH_SIZE = 1000
+
+# Exit status of an update that lost a race with another update of the same row
+VERSION_CONFLICT_EXIT_CODE = 3
+
+
+class VersionConflict(click.ClickException):
+    """A row changed between being read and being updated; nothing was saved."""
+    exit_code = VERSION_CONFLICT_EXIT_CODE
+
+
+def pagination_options(command):
+    """Add the --after/--limit/--count options shared by the list commands."""
+    command = click.option('--count', is_flag=True, help="Only print the number of matching rows.")(command)
+    command = click.option('--limit', type=click.IntRange(min=1), help="Maximum number of rows to show.")(command)
+    command = click.option('--after', type=int, help="Only show rows with an ID greater than this.")(command)
+    return command
+
+
+def paginate(query, key, after, limit, count):
+    """Apply keyset pagination to ``query`` ordered by ``key``.
+
+    Pages start after a key value rather than at an offset, so every page is
+    a primary key range scan no matter how deep it is. Rows are streamed
+    STREAM_BATCH_SIZE at a time instead of being loaded all at once. With
+    ``count`` the matching rows are counted with SELECT COUNT(*) instead and
+    the number is returned.
+    """
+    if after is not None:
+        query = query.filter(key > after)
+    if count:
+        return query.with_entities(func.count(key)).scalar()
+    query = query.order_by(key)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+
+
+def next_page_hint(shown, limit, last_key):
+    """Tell the user how to fetch the next page when a page came back full."""
+    if limit is not None and shown == limit:
+        click.echo(f"More rows may follow; continue with --after {last_key}", err=True)
+
+
+def check_version(session, name, version, expected):
+    """Close ``session`` and raise VersionConflict unless ``version`` is ``expected``.
+
+    ``expected`` is an --expect-version value; None skips the check.
+    """
+    if expected is not None and version != expected:
+        session.close()
+        raise VersionConflict(f"{name} is at version {version}, not {expected}; nothing was changed.")
+
+
+def commit_versioned(session, name, row):
+    """Commit ``session`` and return the new version of ``row``.
+
+    Every UPDATE of a versioned row only matches the version that was read,
+    so if another process updated the row first nothing is written, and
+    this closes the session and raises VersionConflict.
+    """
+    try:
+        session.flush()
+        version = row.version
+        session.commit()
+    except StaleDataError:
+        session.close()
+        raise VersionConflict(f"{name} was changed by someone else meanwhile; nothing was changed.")
+    return version
@@ -0,0 +1,153 @@
+"""Commands for customers."""
+import click
+
+from commands.archive import order_history
+from commands.common import (
+    STREAM_BATCH_SIZE, check_version, commit_versioned, next_page_hint, paginate, pagination_options,
+)
+from commands.orders import order_list_query, print_order
+from db import DBSession
+from models import Customer, CustomerSummary, Order, OrderLine
+
+
+def customer_list_query(session):
+    return session.query(Customer.customer_id, Customer.customer_name, Customer.email, Customer.phone,
+                         Customer.version)
+
+
+def customer_history_query(session, customer_id, before, orders=Order, lines=OrderLine):
+    """A customer's orders, newest first, read through the customer_id index."""
+    query = order_list_query(session, orders, lines).filter(orders.customer_id == customer_id)
+    if before is not None:
+        query = query.filter(orders.order_id < before)
+    return query.order_by(orders.order_id.desc())
+
+
+# Command to list all customers in the bookstore
+@click.command()
+@pagination_options
+def list_customers(after, limit, count):
+    """List all customers in the bookstore"""
+    session = DBSession()
+    customers = paginate(customer_list_query(session), Customer.customer_id, after, limit, count)
+    if count:
+        session.close()
+        print(customers)
+        return
+
+    shown = 0
+    for customer_id, customer_name, email, phone, version in customers:
+        shown += 1
+        print(f"Customer ID: {customer_id}, Name: {customer_name}, Email: {email}, Phone: {phone}, "
+              f"Version: {version}")
+    session.close()
+    next_page_hint(shown, limit, customer_id if shown else after)
+
+
+@click.command()
+@click.argument('customer_name')
+@click.argument('email')
+@click.argument('phone')
+def add_customer(customer_name, email, phone):
+    """Add a new customer to the bookstore"""
+    session = DBSession()
+    
+    customer = Customer(customer_name=customer_name, email=email, phone=phone)
+    session.add(customer)
+    session.commit()
+    
+    session.close()
+    click.echo(f"Customer '{customer_name}' added successfully!")
+
+
+@click.command()
+@click.argument('customer_id', type=int)
+@click.argument('email')
+@click.argument('phone')
+@click.option('--expect-version', type=int, help="Only update the customer if they are still at this version.")
+def update_customer(customer_id, email, phone, expect_version):
+    """Update customer information
+
+    The customer is only written if no one else changed them since they
+    were read, or since the version given with --expect-version (see
+    list-customers). Otherwise nothing is saved and the command exits
+    with status 3.
+    """
+    session = DBSession()
+    customer = session.query(Customer).filter_by(customer_id=customer_id).first()
+    
+    if customer:
+        check_version(session, f"Customer {customer_id}", customer.version, expect_version)
+        customer.email = email
+        customer.phone = phone
+        version = commit_versioned(session, f"Customer {customer_id}", customer)
+        session.close()
+        click.echo(f"Customer information updated successfully! (version {version})")
+    else:
+        session.close()
+        click.echo(f"Customer with ID {customer_id} does not exist.")
+
+
+@click.command()
+@click.argument('customer_id', type=int)
+def delete_customer(customer_id):
+    """Delete a customer from the bookstore"""
+    session = DBSession()
+    customer = session.query(Customer).filter_by(customer_id=customer_id).first()
+    
+    if customer:
+        session.delete(customer)
+        session.commit()
+        session.close()
+        click.echo(f"Customer with ID {customer_id} deleted successfully!")
+    else:
+        session.close()
+        click.echo(f"Customer with ID {customer_id} does not exist.")
+
+
+# Command to show a customer's lifetime totals and their orders
+@click.command()
+@click.argument('customer_id', type=int)
+@click.option('--before', type=int, help="Only show orders with an ID less than this.")
+@click.option('--limit', type=click.IntRange(min=1), default=20, show_default=True,
+              help="Maximum number of orders to show.")
+@click.option('--summary', 'summary_only', is_flag=True, help="Only show the lifetime totals.")
+@click.option('--include-archive', is_flag=True, help="Include orders moved by archive-orders.")
+def customer_history(customer_id, before, limit, summary_only, include_archive):
+    """Show a customer's lifetime spend and their orders, newest first
+
+    The totals come from the customer_summary table, one primary key read.
+    Orders are paged with --before: each page ends with the value to pass
+    for the next one. The totals always include archived orders; the list
+    only does with --include-archive.
+    """
+    session = DBSession()
+    orders, lines = order_history(session) if include_archive else (Order, OrderLine)
+    customer = session.get(Customer, customer_id)
+    if customer is None:
+        session.close()
+        click.echo(f"Customer with ID {customer_id} does not exist.")
+        return
+
+    summary = session.get(CustomerSummary, customer_id)
+    print(f"Customer ID: {customer.customer_id}, Name: {customer.customer_name}")
+    if summary is None:
+        print("Orders: 0, Lifetime Spend: 0.00, Last Order: None")
+    else:
+        print(f"Orders: {summary.order_count}, Lifetime Spend: {summary.total_spent:.2f}, "
+              f"Last Order: {summary.last_order_date}")
+    print()
+    if summary_only:
+        session.close()
+        return
+
+    query = customer_history_query(session, customer_id, before, orders, lines)
+    shown = 0
+    orders = query.limit(limit).yield_per(STREAM_BATCH_SIZE)
+    for order in orders:
+        shown += 1
+        print_order(order)
+    session.close()
+
+    if shown == limit:
+        click.echo(f"More orders may follow; continue with --before {order.order_id}", err=True)
@@ -0,0 +1,68 @@
+"""The explain command."""
+import click
+from sqlalchemy import text
+
+from commands.books import SEARCH_BOOKS_SQL, book_list_query, book_search_statement, inventory_list_query
+from commands.common import paginate
+from commands.customers import customer_history_query, customer_list_query
+from commands.fuzzy import TRIGRAM_LOOKUPS
+from commands.names import AUTHOR_IDS, GENRE_IDS
+from commands.orders import order_list_query
+from commands.reorder import DAILY_SALES_SQL
+from db import DBSession, get_engine
+from models import Book, Customer, CustomerSummary, Inventory, Order, OrderLine, SalesByGenre
+
+
+def _explain_queries(session):
+    """The statement behind each built-in command, with sample parameters."""
+    return [
+        ('list-books', paginate(book_list_query(session), Book.book_id, 0, 50, False)),
+        ('list-customers', paginate(customer_list_query(session), Customer.customer_id, 0, 50, False)),
+        ('list-orders', paginate(order_list_query(session), Order.order_id, 0, 50, False)),
+        ('list-orders (lines)', session.query(OrderLine).filter(OrderLine.order_id.in_([1, 2, 3]))),
+        ('list-inventory', paginate(inventory_list_query(session), Book.book_id, 0, 50, False)),
+        ('search-books', SEARCH_BOOKS_SQL.bindparams(match='"gatsby"*', limit=20)),
+        ('search-books --fuzzy (authors)', TRIGRAM_LOOKUPS['author'].bindparams(match='"fit" OR "itz"', limit=50)),
+        ('search-books --fuzzy (titles)', TRIGRAM_LOOKUPS['title'].bindparams(match='"gat" OR "ats"', limit=50)),
+        ('search-books (price range)', book_search_statement(None, 10, 20, None, None, 'price', 20)),
+        ('search-books (year range)', book_search_statement(None, None, None, 1990, 1999, 'year-desc', 20)),
+        ('add-book (author lookup)', AUTHOR_IDS.statement('Author 1')),
+        ('add-book (genre lookup)', GENRE_IDS.statement('Genre 1')),
+        ('update-book', session.query(Book).filter_by(book_id=1).limit(1)),
+        ('update-book (stock lookup)', session.query(Inventory).filter_by(book_id=1).limit(1)),
+        ('update-customer', session.query(Customer).filter_by(customer_id=1).limit(1)),
+        ('delete-book', session.query(Book).filter_by(book_id=1).limit(1)),
+        ('delete-customer', session.query(Customer).filter_by(customer_id=1).limit(1)),
+        ('report revenue', session.query(SalesByGenre)
+            .filter(SalesByGenre.sale_date >= '2023-01-01', SalesByGenre.sale_date <= '2023-12-31')),
+        ('customer-history', customer_history_query(session, 1, 1000).limit(20)),
+        ('customer-history (summary)', session.query(CustomerSummary).filter_by(customer_id=1)),
+        ('reorder-report', DAILY_SALES_SQL.bindparams(since='2023-10-03', as_of='2024-01-01')),
+        ('customer orders', session.query(Order)
+            .filter(Order.customer_id == 1, Order.order_date >= '2023-01-01')
+            .order_by(Order.order_date)),
+    ]
+
+
+# Command to show how SQLite executes each built-in command's query
+@click.command()
+def explain():
+    """Print the EXPLAIN QUERY PLAN of each built-in command's query"""
+    session = DBSession()
+    scans = 0
+    for command, query in _explain_queries(session):
+        statement = getattr(query, 'statement', query)
+        sql = str(statement.compile(dialect=get_engine().dialect, compile_kwargs={'literal_binds': True}))
+        print(f"{command}:")
+        for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+            detail = row[-1]
+            # A bare SCAN (no index, not the FTS index) reads the whole table
+            full_scan = detail.startswith('SCAN') and ' USING ' not in detail and 'VIRTUAL TABLE' not in detail
+            scans += full_scan
+            print(f"    {detail}{'    <-- full table scan' if full_scan else ''}")
+    session.close()
+
+    if scans:
+        click.echo(f"{scans} full table scan(s) found.")
+    else:
+        click.echo("No full table scans found.")
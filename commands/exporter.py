@@ -0,0 +1,126 @@
+"""The export command."""
+import contextlib
+import csv
+import json
+import time
+from datetime import date, datetime
+
+import click
+from sqlalchemy import select
+
+from commands.archive import ARCHIVE_TABLES, history_table
+from db import get_engine
+from models import Base
+
+# Size of the write buffer for CSV and JSONL output
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def _open_text(path):
+    if path == '-':
+        # Write to standard output without closing it afterwards
+        return contextlib.nullcontext(click.get_text_stream('stdout'))
+    return open(path, 'w', newline='', buffering=WRITE_BUFFER_SIZE)
+
+
+def _write_csv(path, table, chunks):
+    with _open_text(path) as stream:
+        writer = csv.writer(stream)
+        writer.writerow(table.columns.keys())
+        for rows in chunks:
+            writer.writerows(rows)
+
+
+def _write_jsonl(path, table, chunks):
+    keys = table.columns.keys()
+    # One encoder for the whole export; json.dumps(default=...) builds a new one per call
+    encode = json.JSONEncoder(default=str).encode
+    with _open_text(path) as stream:
+        for rows in chunks:
+            stream.write("".join(encode(dict(zip(keys, row))) + "\n" for row in rows))
+
+
+def _arrow_schema(pa, table):
+    types = {int: pa.int64(), float: pa.float64(), date: pa.date32(), datetime: pa.timestamp('us'), str: pa.string()}
+    fields = []
+    for column in table.columns:
+        try:
+            arrow_type = types.get(column.type.python_type, pa.string())
+        except NotImplementedError:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.key, arrow_type, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+def _write_parquet(path, table, chunks):
+    if path == '-':
+        raise click.BadParameter("Parquet cannot be written to standard output.", param_hint="'--output'")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise click.ClickException("Parquet export needs pyarrow: pip install pyarrow")
+
+    schema = _arrow_schema(pa, table)
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            # Each chunk becomes one Arrow record batch, built column by column
+            columns = zip(*rows)
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+
+
+# Writer for each output format
+EXPORTERS = {
+    'csv': _write_csv,
+    'jsonl': _write_jsonl,
+    'parquet': _write_parquet,
+}
+
+
+# Command to export a table for downstream jobs
+@click.command()
+@click.argument('table_name', metavar='TABLE', type=click.Choice(sorted(Base.metadata.tables)))
+@click.option('--format', 'file_format', type=click.Choice(sorted(EXPORTERS)),
+              help="Output format. Guessed from the --output extension when omitted, otherwise jsonl.")
+@click.option('--output', default='-', show_default=True, type=click.Path(dir_okay=False, allow_dash=True),
+              help="File to write. - writes to standard output.")
+@click.option('--chunk-size', type=click.IntRange(min=1), default=10000, show_default=True,
+              help="Rows fetched and written at a time.")
+@click.option('--include-archive', is_flag=True,
+              help="Include rows moved by archive-orders (orders and order_line only).")
+def export(table_name, file_format, output, chunk_size, include_archive):
+    """Export a table as CSV, JSONL or Parquet
+
+    Rows are streamed from the database CHUNK-SIZE at a time in primary key
+    order, so memory use stays flat however large the table is.
+    """
+    if file_format is None:
+        extension = output.rsplit('.', 1)[-1].lower()
+        file_format = extension if extension in EXPORTERS else 'jsonl'
+
+    table = Base.metadata.tables[table_name]
+    if include_archive and table_name not in ARCHIVE_TABLES:
+        raise click.BadParameter(f"{table_name} has no archive.", param_hint="'--include-archive'")
+    exported = 0
+    started = time.perf_counter()
+
+    with get_engine().connect() as connection:
+        source = history_table(connection, table) if include_archive else table
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            select(source).order_by(*(source.c[column.key] for column in table.primary_key.columns))
+        )
+
+        def chunks():
+            nonlocal exported
+            for rows in result.partitions():
+                exported += len(rows)
+                yield rows
+
+        EXPORTERS[file_format](output, table, chunks())
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Exported {exported} rows from {table_name} in {elapsed:.1f}s "
+               f"({exported / elapsed if elapsed else 0:.0f} rows/sec).", err=True)
@@ -0,0 +1,93 @@
+"""Typo-tolerant author and title lookups over the trigram indexes."""
+import re
+
+from sqlalchemy import text
+
+# Candidates fetched from a trigram index per lookup, best bm25 rank first.
+# Only these are scored in Python, so a lookup never reads every name.
+FUZZY_CANDIDATES = 50
+
+# Lowest share of a search's trigrams that a title or author must contain
+FUZZY_THRESHOLD = 0.5
+
+# Similarity above which add-book and add-author warn about a near-duplicate author
+DUPLICATE_AUTHOR_THRESHOLD = 0.5
+
+# author_trigram and title_trigram are FTS5 tables with the trigram
+# tokenizer over author_genre.author_name and book.title, kept up to date
+# by triggers (see the add_trigram_indexes migration)
+TRIGRAM_LOOKUPS = {
+    'author': text(
+        "SELECT rowid, author_name FROM author_trigram "
+        "WHERE author_trigram MATCH :match ORDER BY rank LIMIT :limit"
+    ),
+    'title': text(
+        "SELECT rowid, title FROM title_trigram "
+        "WHERE title_trigram MATCH :match ORDER BY rank LIMIT :limit"
+    ),
+}
+
+_NOT_WORD = re.compile(r"[\W_]+")
+
+
+def _words(value):
+    return _NOT_WORD.sub(' ', value.lower()).split()
+
+
+def trigrams(value):
+    """The set of trigrams of ``value``, each word padded as "  word "."""
+    grams = set()
+    for word in _words(value):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    """Share of trigrams the two strings have in common, from 0 to 1."""
+    left, right = trigrams(left), trigrams(right)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def coverage(search, value):
+    """Share of the trigrams of ``search`` that ``value`` contains, from 0 to 1.
+
+    Unlike similarity(), a short search scores highly against a longer
+    title that contains it ("gatsbi" against "The Great Gatsby").
+    """
+    search, value = trigrams(search), trigrams(value)
+    if not search:
+        return 0.0
+    return len(search & value) / len(search)
+
+
+def _probe(value):
+    """FTS5 expression matching any three-letter run of a word in ``value``.
+
+    The trigram tokenizer indexes the raw text, so only runs inside a
+    word (not the padded ones) can be looked up; words shorter than three
+    letters are matched by similarity alone.
+    """
+    runs = {word[i:i + 3] for word in _words(value) for i in range(len(word) - 2)}
+    return " OR ".join(f'"{run}"' for run in sorted(runs))
+
+
+def similar(executor, kind, value, threshold=FUZZY_THRESHOLD, score=coverage):
+    """Return ``(id, name, score)`` for the authors or titles most like ``value``.
+
+    ``kind`` is 'author' or 'title' and ``score`` is coverage() for
+    searches or similarity() to compare whole names. The best matches come
+    first; equal scores go to the name closest in length and spelling.
+    """
+    match = _probe(value)
+    if not match:
+        return []
+    candidates = executor.execute(TRIGRAM_LOOKUPS[kind], {'match': match, 'limit': FUZZY_CANDIDATES})
+    scored = [(row_id, name, score(value, name), similarity(value, name)) for row_id, name in candidates]
+    return [
+        (row_id, name, row_score)
+        for row_id, name, row_score, _ in sorted(scored, key=lambda row: (-row[2], -row[3], row[0]))
+        if row_score >= threshold
+    ]
@@ -0,0 +1,336 @@
+"""The bulk import command."""
+import csv
+import json
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+import click
+from sqlalchemy import insert, select
+
+from commands.catalog import CATALOG
+from commands.names import AUTHOR_IDS, GENRE_IDS
+from commands.reports import record_customer_orders, record_sales
+from db import get_engine, retry_on_lock
+from models import Book, Customer, Inventory, Order, OrderLine
+
+
+def read_records(stream, file_format):
+    """Yield ``(line_number, record, error)`` for each row of a CSV or JSONL stream.
+
+    Rows are read lazily so the whole file never has to fit in memory.
+    ``record`` is a dict of raw values; ``error`` is set instead when the
+    line could not be parsed at all.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, record, "too many fields"
+            else:
+                yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield line_number, line.rstrip("\n"), f"invalid JSON: {error}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, record, "expected a JSON object"
+        else:
+            yield line_number, record, None
+
+
+def record_field(record, name, convert=str, required=True, default=None):
+    """Read and convert one field of an import record, raising ValueError if it is bad.
+
+    A missing optional field is ``default``.
+    """
+    value = record.get(name)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"missing {name}")
+        return default
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid {name}: {value!r}")
+
+
+def parse_date(value):
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+class _NameMap:
+    """Resolves author or genre names to ids for the bulk import.
+
+    Known names come from the shared name cache, which is preloaded with one
+    query up front. Names missing from the database are inserted on first
+    sight and kept here until their batch commits, then handed to the
+    cache, so each name costs at most one statement for the whole run.
+    """
+
+    def __init__(self, connection, cache):
+        self.cache = cache
+        cache.preload(connection)
+        # Names inserted by the batch being written
+        self.added = {}
+
+    def resolve(self, connection, name):
+        row_id = self.added.get(name)
+        if row_id is None:
+            row_id = self.cache.get(connection, name)
+        if row_id is None:
+            table = self.cache.model.__table__
+            result = connection.execute(insert(table).values({self.cache.name_attribute: name}))
+            row_id = self.added[name] = result.inserted_primary_key[0]
+        return row_id
+
+    def commit(self):
+        """Hand the names inserted by a committed batch to the cache."""
+        for name, row_id in self.added.items():
+            self.cache.put(name, row_id)
+        self.added = {}
+
+    def rollback(self):
+        """Forget the names inserted by a batch that was rolled back."""
+        self.added = {}
+
+
+def _import_books(connection, rows, name_maps):
+    authors, genres = name_maps
+    book_rows = []
+    stock = []
+    for record in rows:
+        book_rows.append({
+            'title': record['title'],
+            'author_id': authors.resolve(connection, record['author_name']),
+            'genre_id': genres.resolve(connection, record['genre_name']),
+            'publication_year': record['publication_year'],
+            'price': record['price'],
+        })
+        stock.append(record['quantity_in_stock'])
+
+    # One batched INSERT whose sorted ids line up with the rows, as in insert_orders
+    book_table = Book.__table__
+    book_ids = sorted(connection.execute(insert(book_table).returning(book_table.c.book_id), book_rows).scalars())
+
+    # Mirror add-book: every book gets a stock row
+    connection.execute(insert(Inventory.__table__), [
+        {'book_id': book_id, 'quantity_in_stock': quantity or 0}
+        for book_id, quantity in zip(book_ids, stock)
+    ])
+    CATALOG.invalidate()
+    return len(book_rows), []
+
+
+def _import_customers(connection, rows, name_maps):
+    connection.execute(insert(Customer.__table__), rows)
+    return len(rows), []
+
+
+def insert_orders(connection, orders):
+    """Insert orders with their lines and return their new ids, in order.
+
+    ``orders`` is a list of dicts with ``customer_id``, ``order_date`` and
+    ``lines``, a list of dicts with ``book_id``, ``quantity`` and
+    ``unit_price``. Each order's total is the sum of its lines. The headers
+    and the lines are written with one executemany each, and the customer
+    summaries are brought up to date.
+    """
+    headers = [
+        {
+            'customer_id': order['customer_id'],
+            'order_date': order['order_date'],
+            'total_amount': round(sum((line['unit_price'] or 0) * line['quantity'] for line in order['lines']), 2),
+        }
+        for order in orders
+    ]
+    # SQLite can only match RETURNING rows to parameters by running one
+    # INSERT per row. Inserted in one batch, the rows take ascending ids in
+    # parameter order while this transaction holds the write lock, so the
+    # sorted ids line up with the orders instead.
+    order_table = Order.__table__
+    order_ids = sorted(connection.execute(insert(order_table).returning(order_table.c.order_id), headers).scalars())
+    connection.execute(insert(OrderLine.__table__), [
+        {**line, 'order_id': order_id}
+        for order, order_id in zip(orders, order_ids)
+        for line in order['lines']
+    ])
+    record_customer_orders(connection, (
+        (header['customer_id'], header['order_date'], header['total_amount']) for header in headers
+    ))
+    return order_ids
+
+
+def _import_orders(connection, rows, name_maps):
+    # Check every referenced customer and book with one query per table
+    customer_ids = set(connection.execute(
+        select(Customer.customer_id).where(Customer.customer_id.in_({row['customer_id'] for row in rows}))
+    ).scalars())
+    books = {
+        book_id: (author_id, genre_id)
+        for book_id, author_id, genre_id in connection.execute(
+            select(Book.book_id, Book.author_id, Book.genre_id)
+            .where(Book.book_id.in_({row['book_id'] for row in rows}))
+        )
+    }
+
+    valid, rejected = [], []
+    for row in rows:
+        if row['quantity'] < 1:
+            rejected.append((row, "quantity must be at least 1"))
+        elif row['total_amount'] is not None and row['total_amount'] < 0:
+            rejected.append((row, "total_amount must not be negative"))
+        elif row['customer_id'] not in customer_ids:
+            rejected.append((row, f"customer {row['customer_id']} does not exist"))
+        elif row['book_id'] not in books:
+            rejected.append((row, f"book {row['book_id']} does not exist"))
+        else:
+            valid.append(row)
+    if valid:
+        # Each imported row is an order of one line
+        insert_orders(connection, [
+            {
+                'customer_id': row['customer_id'],
+                'order_date': row['order_date'],
+                'lines': [{
+                    'book_id': row['book_id'],
+                    'quantity': row['quantity'],
+                    'unit_price': None if row['total_amount'] is None else row['total_amount'] / row['quantity'],
+                }],
+            }
+            for row in valid
+        ])
+        record_sales(connection, (
+            (row['order_date'], *books[row['book_id']], row['quantity'], row['total_amount'])
+            for row in valid
+        ))
+    return len(valid), rejected
+
+
+# For each importable kind: how to turn a raw record into insert values,
+# and how to write a batch of them
+IMPORTERS = {
+    'books': (
+        lambda record: {
+            'title': record_field(record, 'title'),
+            'author_name': record_field(record, 'author_name'),
+            'genre_name': record_field(record, 'genre_name'),
+            'publication_year': record_field(record, 'publication_year', int, required=False),
+            'price': record_field(record, 'price', float, required=False),
+            'quantity_in_stock': record_field(record, 'quantity_in_stock', int, required=False),
+        },
+        _import_books,
+    ),
+    'customers': (
+        lambda record: {
+            'customer_name': record_field(record, 'customer_name'),
+            'email': record_field(record, 'email', required=False),
+            'phone': record_field(record, 'phone', required=False),
+        },
+        _import_customers,
+    ),
+    'orders': (
+        lambda record: {
+            'customer_id': record_field(record, 'customer_id', int),
+            'book_id': record_field(record, 'book_id', int),
+            'order_date': record_field(record, 'order_date', parse_date),
+            'total_amount': record_field(record, 'total_amount', float, required=False),
+            'quantity': record_field(record, 'quantity', int, required=False, default=1),
+        },
+        _import_orders,
+    ),
+}
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help="Input format. Guessed from the file extension when omitted.")
+@click.option('--batch-size', type=click.IntRange(min=1), default=5000, show_default=True,
+              help="Rows inserted per transaction.")
+@click.option('--rejects', type=click.Path(dir_okay=False),
+              help="File that malformed rows are written to. Defaults to PATH.rejects.jsonl.")
+def import_data(kind, path, file_format, batch_size, rejects):
+    """Bulk import books, customers or orders from a CSV or JSONL file
+
+    Use - as PATH to read from standard input. Rows that cannot be imported
+    are written to the rejects file and the import carries on.
+    """
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    if rejects is None:
+        rejects = 'import.rejects.jsonl' if path == '-' else f"{path}.rejects.jsonl"
+
+    convert, write_batch = IMPORTERS[kind]
+    imported = rejected = 0
+    started = time.perf_counter()
+
+    reject_file = None
+    with click.open_file(path) as stream, ExitStack() as cleanup:
+
+        def reject(line_number, record, error):
+            nonlocal rejected, reject_file
+            # Opened on the first reject, so a clean import leaves no file behind
+            if reject_file is None:
+                reject_file = cleanup.enter_context(open(rejects, 'w'))
+            rejected += 1
+            reject_file.write(json.dumps({'line': line_number, 'error': error, 'record': record}, default=str) + "\n")
+
+        def flush(batch):
+            nonlocal imported
+            if not batch:
+                return
+
+            def write():
+                # One transaction and one executemany per batch
+                with get_engine().begin() as connection:
+                    return write_batch(connection, [row for _, _, row in batch], name_maps)
+
+            def forget_batch():
+                for name_map in name_maps or ():
+                    name_map.rollback()
+
+            # A batch that finds the database locked is rolled back, so it can be written again
+            count, failed = retry_on_lock(write, rollback=forget_batch)
+            for name_map in name_maps or ():
+                name_map.commit()
+            imported += count
+            by_row = {id(row): (line_number, record) for line_number, record, row in batch}
+            for row, error in failed:
+                reject(*by_row[id(row)], error)
+            elapsed = time.perf_counter() - started
+            click.echo(f"{imported} rows imported, {rejected} rejected ({imported / elapsed:.0f} rows/sec)", err=True)
+
+        name_maps = None
+        if kind == 'books':
+            with get_engine().connect() as connection:
+                name_maps = (
+                    _NameMap(connection, AUTHOR_IDS),
+                    _NameMap(connection, GENRE_IDS),
+                )
+
+        batch = []
+        for line_number, record, error in read_records(stream, file_format):
+            if error is None:
+                try:
+                    batch.append((line_number, record, convert(record)))
+                except ValueError as exc:
+                    error = str(exc)
+            if error is not None:
+                reject(line_number, record, error)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        flush(batch)
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Imported {imported} {kind} in {elapsed:.1f}s ({imported / elapsed if elapsed else 0:.0f} rows/sec).")
+    if rejected:
+        click.echo(f"{rejected} rows rejected, see {rejects}.")
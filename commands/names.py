@@ -0,0 +1,92 @@
+"""Cached author and genre name -> id lookups."""
+from collections import OrderedDict
+
+import click
+from sqlalchemy import event, inspect, select
+
+from db import setting
+from models import AuthorGenre, Genre
+
+
+class NameCache:
+    """Bounded LRU read-through cache of names to ids for one table.
+
+    A cached name costs no query. A name that is not cached is looked up
+    once and remembered; the least recently used names are dropped once
+    the cache holds ``maxsize`` of them. Inserting, renaming or deleting a
+    row through the ORM drops its name, so a rolled back insert can never
+    leave a stale id behind; the next lookup reads the committed row.
+    """
+
+    def __init__(self, model, name_attribute, maxsize):
+        self.model = model
+        self.name_attribute = name_attribute
+        self.name_column = getattr(model, name_attribute)
+        self.maxsize = maxsize
+        self.ids = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        for event_name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, event_name, self._invalidate)
+
+    def statement(self, name):
+        """The SELECT used to look up a name that is not cached."""
+        return select(self.model.id).where(self.name_column == name).limit(1)
+
+    def get(self, executor, name):
+        """Return the id for ``name``, or None if there is no such row.
+
+        ``executor`` is a Session or a Connection; it is only used on a miss.
+        """
+        row_id = self.ids.get(name)
+        if row_id is not None:
+            self.hits += 1
+            self.ids.move_to_end(name)
+            return row_id
+        self.misses += 1
+        row_id = executor.execute(self.statement(name)).scalar()
+        if row_id is not None:
+            self.put(name, row_id)
+        return row_id
+
+    def put(self, name, row_id):
+        """Remember a committed row."""
+        self.ids[name] = row_id
+        self.ids.move_to_end(name)
+        while len(self.ids) > self.maxsize:
+            self.ids.popitem(last=False)
+
+    def preload(self, executor):
+        """Fill the cache with one query, for bulk paths that will resolve many names."""
+        rows = executor.execute(
+            select(self.name_column, self.model.id).order_by(self.model.id.desc()).limit(self.maxsize)
+        )
+        for name, row_id in reversed(rows.all()):
+            self.put(name, row_id)
+
+    def discard(self, name):
+        self.ids.pop(name, None)
+
+    def _invalidate(self, mapper, connection, target):
+        history = inspect(target).attrs[self.name_attribute].history
+        for name in (*history.deleted, getattr(target, self.name_attribute)):
+            self.discard(name)
+
+
+AUTHOR_IDS = NameCache(AuthorGenre, 'author_name', setting('name_cache_size'))
+GENRE_IDS = NameCache(Genre, 'genre_name', setting('name_cache_size'))
+
+
+# Command to show how well the name caches are doing in this process
+@click.command()
+def cache_stats():
+    """Show hit and miss counts of the author and genre name caches
+
+    The caches live as long as the process, so the counts are most useful
+    from the shell or the server.
+    """
+    for label, cache in (('Authors', AUTHOR_IDS), ('Genres', GENRE_IDS)):
+        lookups = cache.hits + cache.misses
+        ratio = cache.hits / lookups if lookups else 0
+        print(f"{label}: {len(cache.ids)}/{cache.maxsize} cached, "
+              f"{cache.hits} hits, {cache.misses} misses ({ratio:.0%} hit rate)")
@@ -0,0 +1,317 @@
+"""Commands for customer orders."""
+import json
+import time
+from datetime import date, datetime
+
+import click
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import selectinload
+
+from commands.archive import order_history
+from commands.common import next_page_hint, paginate, pagination_options
+from commands.importer import insert_orders, parse_date, read_records, record_field
+from commands.reports import record_customer_orders, record_sales
+from db import DBSession, get_engine, retry_on_lock
+from models import Book, Customer, Inventory, Order, OrderLine
+
+
+def order_list_query(session, orders=Order, lines=OrderLine):
+    # Each page of orders loads its lines with one more IN query. orders and
+    # lines are aliases over the archive too with --include-archive.
+    return session.query(orders).options(selectinload(orders.lines.of_type(lines)))
+
+
+def take_stock(session, book_id, quantity):
+    """Atomically take ``quantity`` copies of a book out of stock.
+
+    The check and the decrement are one conditional UPDATE, so two
+    processes selling the last copy at the same time cannot both succeed.
+    The stock row's version is bumped too, as for any other change to it.
+    Returns False, changing nothing, when there is not enough stock.
+    """
+    result = session.execute(
+        update(Inventory)
+        .where(Inventory.book_id == book_id, Inventory.quantity_in_stock >= quantity)
+        .values(quantity_in_stock=Inventory.quantity_in_stock - quantity, version=Inventory.version + 1)
+    )
+    return result.rowcount == 1
+
+
+def sell_book(session, book, customer_id, order_date, total_amount, quantity):
+    """Record an order of one line and take its books out of stock, then commit.
+
+    Returns the new order's id, or None, with the session rolled back, when
+    there are not enough copies in stock.
+    """
+    if not take_stock(session, book.book_id, quantity):
+        session.rollback()
+        return None
+
+    order = Order(
+        customer_id=customer_id,
+        order_date=order_date,
+        total_amount=total_amount,
+        lines=[OrderLine(book_id=book.book_id, quantity=quantity, unit_price=total_amount / quantity)],
+    )
+    session.add(order)
+    session.flush()
+    order_id = order.order_id
+
+    # Keep the sales rollups and the customer's summary current in the same transaction
+    record_sales(session.connection(), [(order_date, book.author_id, book.genre_id, quantity, total_amount)])
+    record_customer_orders(session.connection(), [(customer_id, order_date, total_amount)])
+
+    session.commit()
+    return order_id
+
+
+def print_order(order):
+    print(f"Order ID: {order.order_id}")
+    print(f"Customer ID: {order.customer_id}")
+    print(f"Order Date: {order.order_date}")
+    print(f"Total Amount: {order.total_amount}")
+    for line in order.lines:
+        print(f"  Book ID: {line.book_id}, Quantity: {line.quantity}, Unit Price: {line.unit_price}")
+    print()
+
+
+# Command to list all customer orders in the bookstore
+@click.command()
+@pagination_options
+@click.option('--include-archive', is_flag=True, help="Include orders moved by archive-orders.")
+def list_orders(after, limit, count, include_archive):
+    """List all customer orders in the bookstore"""
+    session = DBSession()
+    orders, lines = order_history(session) if include_archive else (Order, OrderLine)
+    orders = paginate(order_list_query(session, orders, lines), orders.order_id, after, limit, count)
+    if count:
+        session.close()
+        print(orders)
+        return
+
+    shown = 0
+    for order in orders:
+        shown += 1
+        print_order(order)
+    session.close()
+
+    if not shown and after is None:
+        click.echo("No customer orders found.")
+    next_page_hint(shown, limit, order.order_id if shown else after)
+
+
+@click.command()
+@click.argument('customer_id', type=int)
+@click.argument('book_id', type=int)
+@click.argument('order_date')
+@click.argument('total_amount', type=float)
+@click.argument('quantity', type=click.IntRange(min=1))
+def add_order_item(customer_id, book_id, order_date, total_amount, quantity):
+    """Add a new order item to the bookstore and take its QUANTITY out of stock"""
+    session = DBSession()
+
+    # Check if the customer and book exist
+    customer = session.query(Customer).filter_by(customer_id=customer_id).first()
+    book = session.query(Book).filter_by(book_id=book_id).first()
+
+    if customer is None:
+        session.close()
+        click.echo(f"Customer with ID {customer_id} does not exist.")
+        return
+
+    if book is None:
+        session.close()
+        click.echo(f"Book with ID {book_id} does not exist.")
+        return
+
+    # Convert the order date to a date object
+    try:
+        order_date = datetime.strptime(order_date, '%Y-%m-%d').date()
+    except ValueError:
+        session.close()
+        click.echo("Invalid date format. Please use YYYY-MM-DD.")
+        return
+
+    # Concurrent sales can lock the database; run the whole sale again if so
+    order_id = retry_on_lock(
+        lambda: sell_book(session, book, customer_id, order_date, total_amount, quantity),
+        rollback=session.rollback,
+    )
+    session.close()
+    if order_id is None:
+        click.echo(f"Not enough stock for book with ID {book_id}.")
+        return
+
+    click.echo("Order item added successfully!")
+
+
+def _order_line(record):
+    """Turn a raw place-orders record into an order line, raising ValueError if it is bad."""
+    return {
+        'customer_id': record_field(record, 'customer_id', int),
+        'book_id': record_field(record, 'book_id', int),
+        'quantity': record_field(record, 'quantity', int, required=False) or 1,
+        'order_date': record_field(record, 'order_date', parse_date, required=False) or date.today(),
+        'basket': record_field(record, 'basket', required=False),
+    }
+
+
+def _baskets(lines):
+    """Group parsed lines into orders: lines sharing a customer, date and basket form one order."""
+    baskets = {}
+    for line_number, line in lines:
+        if line['basket'] is None:
+            key = ('line', line_number)
+        else:
+            key = (line['customer_id'], line['order_date'], line['basket'])
+        baskets.setdefault(key, []).append((line_number, line))
+    return list(baskets.values())
+
+
+def _place_batch(connection, baskets, stock):
+    """Validate and insert one batch of baskets on ``connection``.
+
+    Each basket is a list of ``(line_number, order_line)`` that becomes one
+    order. Customers, books and stock are each read with one IN query per
+    batch; ``stock`` carries the remaining stock of books already seen by
+    earlier batches of the same transaction. Returns ``(line_number,
+    order_id, amount, error)`` for every line.
+    """
+    lines = [line for basket in baskets for _, line in basket]
+    customer_ids = set(connection.execute(
+        select(Customer.customer_id).where(Customer.customer_id.in_({line['customer_id'] for line in lines}))
+    ).scalars())
+    book_ids = {line['book_id'] for line in lines}
+    books = {
+        book_id: (author_id, genre_id, price)
+        for book_id, author_id, genre_id, price in connection.execute(
+            select(Book.book_id, Book.author_id, Book.genre_id, Book.price).where(Book.book_id.in_(book_ids))
+        )
+    }
+    stock.update(connection.execute(
+        select(Inventory.book_id, Inventory.quantity_in_stock)
+        .where(Inventory.book_id.in_(book_ids - stock.keys()))
+    ).all())
+
+    results, orders, taken = [], [], {}
+    for basket in baskets:
+        order = None
+        for line_number, line in basket:
+            book_id, quantity = line['book_id'], line['quantity']
+            if quantity < 1:
+                error = "quantity must be at least 1"
+            elif line['customer_id'] not in customer_ids:
+                error = f"customer {line['customer_id']} does not exist"
+            elif book_id not in books:
+                error = f"book {book_id} does not exist"
+            elif books[book_id][2] is None:
+                error = f"book {book_id} has no price"
+            elif stock.get(book_id, 0) < quantity:
+                error = f"not enough stock for book {book_id}"
+            else:
+                error = None
+                stock[book_id] -= quantity
+                taken[book_id] = taken.get(book_id, 0) + quantity
+                if order is None:
+                    order = {'customer_id': line['customer_id'], 'order_date': line['order_date'],
+                             'lines': [], 'results': []}
+                    orders.append(order)
+                order['lines'].append({'book_id': book_id, 'quantity': quantity, 'unit_price': books[book_id][2]})
+                order['results'].append(len(results))
+            results.append((line_number, None, None, error))
+    if not orders:
+        return results
+
+    # The same conditional decrement as take_stock, one row per book. Each
+    # book was checked above, so a short count means stock changed under us.
+    inventory = Inventory.__table__
+    updated = connection.execute(
+        update(inventory)
+        .where(inventory.c.book_id == bindparam('b_book_id'), inventory.c.quantity_in_stock >= bindparam('taken'))
+        .values(quantity_in_stock=inventory.c.quantity_in_stock - bindparam('taken'),
+                version=inventory.c.version + 1),
+        [{'b_book_id': book_id, 'taken': quantity} for book_id, quantity in taken.items()],
+    ).rowcount
+    if updated != len(taken):
+        raise click.ClickException("Stock changed while the orders were being placed; nothing was placed.")
+
+    order_ids = insert_orders(connection, orders)
+    sales = []
+    for order, order_id in zip(orders, order_ids):
+        for line, index in zip(order['lines'], order['results']):
+            amount = round(line['unit_price'] * line['quantity'], 2)
+            results[index] = (results[index][0], order_id, amount, None)
+            sales.append((order['order_date'], *books[line['book_id']][:2], line['quantity'], amount))
+    record_sales(connection, sales)
+    return results
+
+
+# Command to place a stream of orders in one transaction
+@click.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help="Input format. Guessed from the file extension when omitted.")
+@click.option('--batch-size', type=click.IntRange(min=1), default=1000, show_default=True,
+              help="Order lines validated per round of queries.")
+def place_orders(path, file_format, batch_size):
+    """Place many orders at once, charging each book's current price
+
+    Reads customer_id, book_id, quantity (default 1), order_date (default
+    today) and an optional basket from each line of a CSV or JSONL file, or
+    from standard input when PATH is -. Lines with the same customer, date
+    and basket become one order; every other line is an order of its own.
+    Amounts are computed from Book.price. All valid lines are placed in one
+    transaction and take their books out of stock; a JSON result is printed
+    for every line, with its order_id and amount or the error that kept it
+    from being placed.
+    """
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+    started = time.perf_counter()
+    parsed, results = [], []
+    with click.open_file(path) as stream:
+        for line_number, record, error in read_records(stream, file_format):
+            if error is None:
+                try:
+                    parsed.append((line_number, _order_line(record)))
+                    continue
+                except ValueError as exc:
+                    error = str(exc)
+            results.append((line_number, None, None, error))
+
+    # Batches hold whole baskets, so an order is never split between them
+    batches, batch, batch_lines = [], [], 0
+    for basket in _baskets(parsed):
+        batch.append(basket)
+        batch_lines += len(basket)
+        if batch_lines >= batch_size:
+            batches.append(batch)
+            batch, batch_lines = [], 0
+    if batch:
+        batches.append(batch)
+
+    def place():
+        # Every batch shares one transaction, so the orders commit together
+        placed = []
+        stock = {}
+        with get_engine().begin() as connection:
+            for baskets in batches:
+                placed.extend(_place_batch(connection, baskets, stock))
+        return placed
+
+    if batches:
+        results.extend(retry_on_lock(place))
+    results.sort()
+
+    for line_number, order_id, amount, error in results:
+        if error is None:
+            click.echo(json.dumps({'line': line_number, 'order_id': order_id, 'amount': amount}))
+        else:
+            click.echo(json.dumps({'line': line_number, 'error': error}))
+
+    elapsed = time.perf_counter() - started
+    placed = [result for result in results if result[3] is None]
+    orders = len({result[1] for result in placed})
+    click.echo(f"Placed {len(placed)} of {len(results)} lines as {orders} orders in {elapsed:.2f}s "
+               f"({len(placed) / elapsed if elapsed else 0:.0f} lines/sec).", err=True)
@@ -0,0 +1,232 @@
+"""'Customers also bought' recommendations from a sparse co-purchase matrix."""
+import os
+import time
+from itertools import chain
+
+import click
+from sqlalchemy import make_url, select, text
+
+from commands.archive import create_history_views
+from db import DBSession, database_url, get_engine, setting
+from models import Book
+
+# Purchases read per round trip while the matrices are built or updated
+SCAN_BATCH_SIZE = 50000
+
+# Who bought which book, in orders after one order ID up to another,
+# including archived orders (see create_history_views)
+PURCHASES_SQL = text(
+    "SELECT order_history.customer_id, order_line_history.book_id "
+    "FROM order_history JOIN order_line_history ON order_line_history.order_id = order_history.order_id "
+    "WHERE order_history.order_id > :after AND order_history.order_id <= :last "
+    "AND order_history.customer_id IS NOT NULL AND order_line_history.book_id IS NOT NULL"
+)
+
+
+def _scientific():
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        raise click.ClickException("Recommendations need SciPy: pip install scipy")
+    return numpy, sparse
+
+
+def recommendations_path():
+    """The matrices' file: the recommendations_file setting, or <database>_recommendations.npz."""
+    root = os.path.splitext(make_url(database_url).database)[0]
+    return setting('recommendations_file') or f"{root}_recommendations.npz"
+
+
+class CoPurchases:
+    """Which customers bought which books, and how many customers bought each pair of books.
+
+    ``owned`` is a customers x books CSR matrix holding 1 where a customer
+    bought a book and ``together`` is the books x books matrix
+    ownedᵀ·owned: the number of customers who bought both books, with
+    each book's number of buyers on the diagonal. Rows and columns are
+    indexed by customer and book ID directly. Both are saved to
+    recommendations_path() with the last order ID they include, and
+    update() folds in only the orders after it.
+    """
+
+    def __init__(self):
+        self.owned = self.together = None
+        self.last_order_id = 0
+
+    def load(self, path):
+        """Read the matrices saved by save(), if the file exists."""
+        np, sparse = _scientific()
+        if not os.path.exists(path):
+            return
+        with np.load(path) as saved:
+            self.owned, self.together = (
+                sparse.csr_matrix((saved[f'{name}_data'], saved[f'{name}_indices'], saved[f'{name}_indptr']),
+                                  shape=tuple(saved[f'{name}_shape']))
+                for name in ('owned', 'together')
+            )
+            self.last_order_id = int(saved['last_order_id'])
+
+    def save(self, path):
+        """Write the matrices to ``path``, replacing it only once the new file is complete."""
+        np, _ = _scientific()
+        arrays = {'last_order_id': np.array(self.last_order_id)}
+        for name, matrix in (('owned', self.owned), ('together', self.together)):
+            arrays.update({f'{name}_data': matrix.data, f'{name}_indices': matrix.indices,
+                           f'{name}_indptr': matrix.indptr, f'{name}_shape': np.array(matrix.shape)})
+        partial = f"{path}.partial"
+        with open(partial, 'wb') as stream:
+            np.savez(stream, **arrays)
+        os.replace(partial, path)
+
+    def update(self, connection):
+        """Add the purchases in orders placed since the last update. Returns the number of new purchases.
+
+        The new orders are read in one streamed scan. With N the new
+        (customer, book) purchases, the pair counts grow by
+        Nᵀ·owned + ownedᵀ·N + Nᵀ·N, so old orders are never read again.
+        When the database has fewer orders than the matrices (after a
+        restore, say) they are rebuilt from scratch.
+        """
+        np, sparse = _scientific()
+        create_history_views(connection)
+        last_order_id = connection.execute(text("SELECT MAX(order_id) FROM order_history")).scalar() or 0
+        if last_order_id < self.last_order_id:
+            self.__init__()
+        if last_order_id == self.last_order_id and self.owned is not None:
+            return 0
+
+        customers, books = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        result = connection.execution_options(stream_results=True, yield_per=SCAN_BATCH_SIZE).execute(
+            PURCHASES_SQL, {'after': self.last_order_id, 'last': last_order_id}
+        )
+        for rows in result.partitions(SCAN_BATCH_SIZE):
+            pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+            customers.append(pairs[:, 0])
+            books.append(pairs[:, 1])
+        customers, books = np.concatenate(customers), np.concatenate(books)
+
+        old_shape = self.owned.shape if self.owned is not None else (0, 0)
+        shape = (max(old_shape[0], int(customers.max(initial=-1)) + 1),
+                 max(old_shape[1], int(books.max(initial=-1)) + 1))
+        if self.owned is None:
+            self.owned = sparse.csr_matrix(shape, dtype=np.int32)
+            self.together = sparse.csr_matrix((shape[1], shape[1]), dtype=np.int32)
+        else:
+            self.owned.resize(shape)
+            self.together.resize((shape[1], shape[1]))
+
+        # Repeat purchases of a book count once, so keep only pairs not already owned
+        new = sparse.csr_matrix((np.ones(len(customers), dtype=np.int32), (customers, books)), shape=shape)
+        new.data[:] = 1
+        new = (new - new.multiply(self.owned)).tocsr()
+        new.eliminate_zeros()
+
+        cross = (self.owned.T @ new).tocsr()
+        self.together = (self.together + cross + cross.T + new.T @ new).tocsr()
+        self.owned = (self.owned + new).tocsr()
+        self.last_order_id = last_order_id
+        return new.nnz
+
+    def for_book(self, book_id, limit):
+        """``(book_id, customers)`` for the books most often bought by customers who bought ``book_id``."""
+        np, _ = _scientific()
+        if book_id >= self.together.shape[0]:
+            return []
+        start, end = self.together.indptr[book_id], self.together.indptr[book_id + 1]
+        books, counts = self.together.indices[start:end], self.together.data[start:end]
+        keep = books != book_id
+        return self._top(np, books[keep], counts[keep], limit)
+
+    def for_customer(self, customer_id, limit):
+        """``(book_id, score)`` for the books most often bought with the ones ``customer_id`` bought.
+
+        A book's score is the sum of its pair counts with each of the
+        customer's books. Books the customer already has are left out.
+        """
+        np, _ = _scientific()
+        if customer_id >= self.owned.shape[0]:
+            return []
+        bought = self.owned[customer_id]
+        scores = (bought @ self.together).tocsr()
+        keep = ~np.isin(scores.indices, bought.indices)
+        return self._top(np, scores.indices[keep], scores.data[keep], limit)
+
+    @staticmethod
+    def _top(np, books, counts, limit):
+        # Highest count first, then lowest book ID
+        order = np.lexsort((books, -counts))[:limit]
+        return [(int(book), int(count)) for book, count in zip(books[order], counts[order])]
+
+
+CO_PURCHASES = CoPurchases()
+
+
+def refresh_co_purchases(rebuild=False):
+    """Load the shared matrices if needed, add new orders and save them if anything changed."""
+    path = recommendations_path()
+    if rebuild:
+        CO_PURCHASES.__init__()
+    elif CO_PURCHASES.owned is None:
+        CO_PURCHASES.load(path)
+
+    started = time.perf_counter()
+    with get_engine().connect() as connection:
+        added = CO_PURCHASES.update(connection)
+    if added or not os.path.exists(path):
+        CO_PURCHASES.save(path)
+        click.echo(f"Added {added} purchases to {path} in {time.perf_counter() - started:.2f}s.", err=True)
+    return CO_PURCHASES
+
+
+# Command to recommend books bought together with a book or a customer's books
+@click.command()
+@click.argument('book_id', type=int, required=False)
+@click.option('--customer', 'customer_id', type=int, help="Recommend books for this customer instead.")
+@click.option('--limit', type=click.IntRange(min=1), default=10, show_default=True,
+              help="Maximum number of books to recommend.")
+@click.option('--rebuild', is_flag=True, help="Rebuild the co-purchase matrix from every order first.")
+def recommend(book_id, customer_id, limit, rebuild):
+    """Recommend books that customers also bought, for a book or a customer
+
+    Recommendations come from a sparse book-by-book matrix of how many
+    customers bought each pair of books, kept in a file next to the
+    database. Each run first adds the orders placed since the last one
+    (--rebuild starts over from every order, archived ones included).
+    Needs SciPy.
+    """
+    if book_id is not None and customer_id is not None:
+        raise click.UsageError("Give either BOOK_ID or --customer, not both.")
+    if book_id is None and customer_id is None and not rebuild:
+        raise click.UsageError("Give BOOK_ID or --customer.")
+
+    matrix = refresh_co_purchases(rebuild)
+    if book_id is None and customer_id is None:
+        return
+
+    started = time.perf_counter()
+    if book_id is not None:
+        recommended = matrix.for_book(book_id, limit)
+        heading, label = f"Customers who bought book {book_id} also bought:", "Customers"
+    else:
+        recommended = matrix.for_customer(customer_id, limit)
+        heading, label = f"Recommended for customer {customer_id}:", "Score"
+    elapsed = time.perf_counter() - started
+
+    if not recommended:
+        click.echo("No recommendations yet.")
+        return
+
+    session = DBSession()
+    titles = dict(session.execute(
+        select(Book.book_id, Book.title).where(Book.book_id.in_([book for book, _ in recommended]))
+    ).all())
+    session.close()
+
+    print(heading)
+    for book, count in recommended:
+        if book not in titles:
+            # Deleted since the orders were counted
+            continue
+        print(f"Book ID: {book}, Title: {titles.get(book)}, {label}: {count}")
+    click.echo(f"Found in {elapsed * 1000:.1f} ms.", err=True)
@@ -0,0 +1,196 @@
+"""Sales rollups and the report commands."""
+from collections import defaultdict
+
+import click
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from commands.archive import create_history_views
+from db import DBSession, get_engine, retry_on_lock
+from models import AuthorGenre, CustomerSummary, Genre, SalesByDay, SalesByGenre, SalesByAuthor
+
+
+# Rollup tables and the key columns each one is grouped by
+SALES_ROLLUPS = (
+    (SalesByDay.__table__, ('sale_date',)),
+    (SalesByGenre.__table__, ('sale_date', 'genre_id')),
+    (SalesByAuthor.__table__, ('sale_date', 'author_id')),
+)
+
+
+# Regenerate every rollup from order history: one grouped scan of
+# order_line into a temporary table, then each rollup is summed from that.
+# The customer summaries are summed from the order headers. Both read the
+# history views, so archived orders still count (see create_history_views).
+REBUILD_SALES_ROLLUPS_SQL = [
+    "DELETE FROM sales_by_day",
+    "DELETE FROM sales_by_genre",
+    "DELETE FROM sales_by_author",
+    """
+    CREATE TEMP TABLE sales_rollup_source AS
+    SELECT orders.order_date AS sale_date, book.author_id, book.genre_id,
+           SUM(order_line.quantity) AS units,
+           SUM(ROUND(COALESCE(order_line.unit_price, 0) * order_line.quantity, 2)) AS revenue
+    FROM order_line_history AS order_line
+    JOIN order_history AS orders ON orders.order_id = order_line.order_id
+    LEFT OUTER JOIN book ON book.book_id = order_line.book_id
+    WHERE orders.order_date IS NOT NULL
+    GROUP BY orders.order_date, book.author_id, book.genre_id
+    """,
+    """
+    INSERT INTO sales_by_day (sale_date, units, revenue)
+    SELECT sale_date, SUM(units), SUM(revenue) FROM sales_rollup_source
+    GROUP BY sale_date
+    """,
+    """
+    INSERT INTO sales_by_genre (sale_date, genre_id, units, revenue)
+    SELECT sale_date, genre_id, SUM(units), SUM(revenue) FROM sales_rollup_source
+    WHERE genre_id IS NOT NULL GROUP BY sale_date, genre_id
+    """,
+    """
+    INSERT INTO sales_by_author (sale_date, author_id, units, revenue)
+    SELECT sale_date, author_id, SUM(units), SUM(revenue) FROM sales_rollup_source
+    WHERE author_id IS NOT NULL GROUP BY sale_date, author_id
+    """,
+    "DROP TABLE sales_rollup_source",
+    "DELETE FROM customer_summary",
+    """
+    INSERT INTO customer_summary (customer_id, order_count, total_spent, last_order_date)
+    SELECT customer_id, COUNT(*), SUM(total_amount), MAX(order_date) FROM order_history
+    WHERE customer_id IS NOT NULL GROUP BY customer_id
+    """,
+]
+
+
+def record_sales(connection, sales):
+    """Add sales to the rollup tables.
+
+    ``sales`` yields ``(sale_date, author_id, genre_id, units, revenue)``
+    tuples. They are summed per rollup key in memory first, then each
+    rollup table gets a single executemany upsert.
+    """
+    totals = {table: defaultdict(lambda: [0, 0.0]) for table, _ in SALES_ROLLUPS}
+    for sale_date, author_id, genre_id, units, revenue in sales:
+        if sale_date is None:
+            continue
+        keys = ((sale_date,), (sale_date, genre_id), (sale_date, author_id))
+        for (table, _), key in zip(SALES_ROLLUPS, keys):
+            if None not in key:
+                total = totals[table][key]
+                total[0] += units
+                total[1] += revenue or 0
+
+    for table, key_columns in SALES_ROLLUPS:
+        if not totals[table]:
+            continue
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={
+                'units': table.c.units + statement.excluded.units,
+                'revenue': table.c.revenue + statement.excluded.revenue,
+            },
+        )
+        connection.execute(statement, [
+            {**dict(zip(key_columns, key)), 'units': units, 'revenue': revenue}
+            for key, (units, revenue) in totals[table].items()
+        ])
+
+
+def record_customer_orders(connection, orders):
+    """Add orders to the customer summaries.
+
+    ``orders`` yields ``(customer_id, order_date, total_amount)`` tuples.
+    They are summed per customer in memory first, then written with a
+    single executemany upsert.
+    """
+    totals = {}
+    for customer_id, order_date, total_amount in orders:
+        if customer_id is None:
+            continue
+        count, spent, last = totals.get(customer_id, (0, 0.0, None))
+        if last is None or (order_date is not None and order_date > last):
+            last = order_date
+        totals[customer_id] = (count + 1, spent + (total_amount or 0), last)
+    if not totals:
+        return
+
+    table = CustomerSummary.__table__
+    statement = sqlite_insert(table)
+    # MAX() of two values is NULL if either is, so fall back to the other one
+    statement = statement.on_conflict_do_update(
+        index_elements=['customer_id'],
+        set_={
+            'order_count': table.c.order_count + statement.excluded.order_count,
+            'total_spent': table.c.total_spent + statement.excluded.total_spent,
+            'last_order_date': func.max(
+                func.coalesce(table.c.last_order_date, statement.excluded.last_order_date),
+                func.coalesce(statement.excluded.last_order_date, table.c.last_order_date),
+            ),
+        },
+    )
+    connection.execute(statement, [
+        {'customer_id': customer_id, 'order_count': count, 'total_spent': spent, 'last_order_date': last}
+        for customer_id, (count, spent, last) in totals.items()
+    ])
+
+
+# Group of sales report commands
+@click.group()
+def report():
+    """Sales reports"""
+
+
+@report.command()
+@click.option('--by', 'group_by', type=click.Choice(['day', 'genre', 'author']), default='day', show_default=True,
+              help="How to group the totals.")
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), help="First day to include.")
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), help="Last day to include.")
+def revenue(group_by, date_from, date_to):
+    """Show revenue and units sold by day, genre or author"""
+    session = DBSession()
+
+    if group_by == 'day':
+        rollup = SalesByDay
+        query = session.query(SalesByDay.sale_date, SalesByDay.units, SalesByDay.revenue).order_by(SalesByDay.sale_date)
+    else:
+        rollup, name, key = {
+            'genre': (SalesByGenre, Genre.genre_name, SalesByGenre.genre_id),
+            'author': (SalesByAuthor, AuthorGenre.author_name, SalesByAuthor.author_id),
+        }[group_by]
+        query = (
+            session.query(name, func.sum(rollup.units), func.sum(rollup.revenue))
+            .join(name.class_, name.class_.id == key)
+            .group_by(key, name)
+            .order_by(func.sum(rollup.revenue).desc())
+        )
+
+    if date_from:
+        query = query.filter(rollup.sale_date >= date_from.date())
+    if date_to:
+        query = query.filter(rollup.sale_date <= date_to.date())
+    rows = query.all()
+    session.close()
+
+    if not rows:
+        click.echo("No sales found.")
+        return
+
+    label = group_by.capitalize()
+    for value, units, amount in rows:
+        print(f"{label}: {value}, Units: {units}, Revenue: {amount:.2f}")
+    print(f"Total Units: {sum(row[1] for row in rows)}, Total Revenue: {sum(row[2] for row in rows):.2f}")
+
+
+@report.command()
+def rebuild():
+    """Regenerate the sales rollups and customer summaries from order history"""
+    def rebuild_rollups():
+        with get_engine().begin() as connection:
+            create_history_views(connection)
+            for statement in REBUILD_SALES_ROLLUPS_SQL:
+                connection.execute(text(statement))
+            return connection.execute(select(func.count()).select_from(SalesByDay.__table__)).scalar()
+
+    days = retry_on_lock(rebuild_rollups)
+    click.echo(f"Sales rollups rebuilt ({days} days of sales).")
@@ -0,0 +1,134 @@
+"""The shell and serve commands, which run many commands in one process."""
+import contextlib
+import io
+import os
+import shlex
+import signal
+import socketserver
+
+import click
+from sqlalchemy import text
+
+from commands.catalog import CATALOG
+from db import get_engine
+
+
+# Commands that cannot be started from inside the shell or the server
+LONG_RUNNING_COMMANDS = {'shell', 'serve'}
+
+
+def _run_command_line(line):
+    """Run one command line, such as ``list-books --limit 5``, in this process.
+
+    Returns the exit code. Output goes to the current stdout and stderr,
+    which the caller may have redirected.
+    """
+    try:
+        args = shlex.split(line)
+    except ValueError as error:
+        click.echo(f"Error: {error}", err=True)
+        return 2
+    if not args:
+        return 0
+    if args[0] in LONG_RUNNING_COMMANDS:
+        click.echo(f"Error: '{args[0]}' cannot be run from here.", err=True)
+        return 2
+
+    # The top-level group that is running the shell or the server
+    group = click.get_current_context().find_root().command
+    try:
+        result = group.main(args, prog_name='cli.py', standalone_mode=False)
+    except click.exceptions.Abort:
+        click.echo("Aborted!", err=True)
+        return 1
+    except click.ClickException as error:
+        error.show()
+        return error.exit_code
+    except Exception as error:
+        # Keep the shell or server alive when a single command fails
+        click.echo(f"Error: {error!r}", err=True)
+        return 1
+    return result if isinstance(result, int) else 0
+
+
+def _warm_up():
+    """Open the first database connection now rather than on the first command."""
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def _catalog_snapshot_option(command):
+    return click.option('--catalog-snapshot', is_flag=True,
+                        help="Answer search-books price and year queries from an in-memory NumPy snapshot.")(command)
+
+
+# Command to run several commands in one process
+@click.command()
+@_catalog_snapshot_option
+def shell(catalog_snapshot):
+    """Run commands interactively, reusing one database engine"""
+    try:
+        import readline  # noqa: F401  (line editing and history for input())
+    except ImportError:
+        pass
+
+    if catalog_snapshot:
+        CATALOG.enable()
+    _warm_up()
+    click.echo("Bookstore shell. Type a command such as 'list-books --limit 5', 'help' or 'exit'.")
+    while True:
+        try:
+            line = input("bookstore> ")
+        except EOFError:
+            click.echo()
+            break
+        except KeyboardInterrupt:
+            click.echo()
+            continue
+        line = line.strip()
+        if line in ('exit', 'quit'):
+            break
+        _run_command_line('--help' if line == 'help' else line)
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """Run the command line sent by a client and send back its output."""
+
+    def handle(self):
+        line = self.rfile.readline().decode('utf-8')
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            _run_command_line(line)
+        self.wfile.write(output.getvalue().encode('utf-8'))
+
+
+# Command to serve commands over a Unix domain socket
+@click.command()
+@click.option('--socket', 'socket_path', required=True, type=click.Path(dir_okay=False),
+              help="Path of the Unix domain socket to listen on.")
+@_catalog_snapshot_option
+def serve(socket_path, catalog_snapshot):
+    """Serve commands over a Unix domain socket
+
+    Each connection sends one command line, for example
+    `printf 'list-books --limit 5\\n' | nc -U SOCKET`, and receives the
+    command's output. Commands run one at a time in this process, so they
+    share one warm engine and skip the start-up cost of a new process.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    # Shut down cleanly, removing the socket file, on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    if catalog_snapshot:
+        CATALOG.enable()
+    _warm_up()
+    with socketserver.UnixStreamServer(socket_path, _CommandHandler) as server:
+        click.echo(f"Listening on {socket_path}", err=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
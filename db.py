@@ -0,0 +1,190 @@
+"""Database engine and sessions, created on first use.
+
+Nothing here imports SQLAlchemy until a command actually needs the
+database, so commands that never touch it (such as ``--help``) start fast.
+
+The database URL and engine settings come from the environment, for
+example ``BOOKSTORE_DATABASE_URL=sqlite:////srv/bookstore/bookstore.db``.
+Every setting in SETTINGS can be overridden the same way, by its name in
+upper case with a ``BOOKSTORE_`` prefix.
+"""
+import os
+import random
+import time
+
+# Actual database URL
+database_url = os.environ.get('BOOKSTORE_DATABASE_URL', 'sqlite:///bookstore.db')
+
+# Engine settings and their defaults
+SETTINGS = {
+    # Connection pool
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_timeout': 30.0,
+    # SQLite pragmas set on every new connection. WAL lets readers carry on
+    # while a writer commits; NORMAL sync is safe with WAL and much faster.
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    # Retries when the database stays locked past the busy timeout
+    'lock_retries': 5,
+    'lock_retry_delay': 0.05,
+    # Author and genre names remembered per process by commands/names.py
+    'name_cache_size': 10000,
+    # Seconds before the shell's or server's catalog snapshot is reloaded
+    'catalog_snapshot_ttl': 60.0,
+    # File archive-orders moves old orders to; empty means <database>_archive.db
+    'archive_database': '',
+    # Directory backup --snapshot writes to; empty means backups/ next to the database
+    'backup_dir': '',
+    # File recommend keeps its co-purchase matrices in; empty means <database>_recommendations.npz
+    'recommendations_file': '',
+}
+
+_engine = None
+_session_factory = None
+_async_engine = None
+_async_session_factory = None
+
+
+def setting(name):
+    """Return a setting, from the environment if it is set there."""
+    default = SETTINGS[name]
+    value = os.environ.get(f'BOOKSTORE_{name.upper()}')
+    return default if value is None else type(default)(value)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+        cursor.execute(f"PRAGMA {pragma} = {setting(pragma)}")
+    cursor.close()
+
+
+def _engine_options(url, kwargs):
+    """Add the pool settings for ``url`` to the create_engine() keyword arguments."""
+    # An in-memory database lives in a single connection, so it has no pool to size
+    if url.database not in (None, '', ':memory:') and 'poolclass' not in kwargs:
+        kwargs.setdefault('pool_size', setting('pool_size'))
+        kwargs.setdefault('max_overflow', setting('max_overflow'))
+        kwargs.setdefault('pool_timeout', setting('pool_timeout'))
+    return kwargs
+
+
+def create_engine(url=None, **kwargs):
+    """Create an engine for ``url`` (the configured database by default) with the settings applied."""
+    import sqlalchemy
+
+    url = sqlalchemy.make_url(url or database_url)
+    if url.get_backend_name() == 'sqlite':
+        engine = sqlalchemy.create_engine(url, **_engine_options(url, kwargs))
+        sqlalchemy.event.listen(engine, 'connect', _set_sqlite_pragmas)
+        return engine
+    return sqlalchemy.create_engine(url, **kwargs)
+
+
+def create_async_engine(url=None, **kwargs):
+    """Like create_engine(), but an asyncio engine; SQLite goes through aiosqlite."""
+    import sqlalchemy
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = sqlalchemy.make_url(url or database_url)
+    if url.get_backend_name() == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+        engine = create_async_engine(url, **_engine_options(url, kwargs))
+        sqlalchemy.event.listen(engine.sync_engine, 'connect', _set_sqlite_pragmas)
+        return engine
+    return create_async_engine(url, **kwargs)
+
+
+def get_engine():
+    """Return the database engine, creating it on the first call."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+    return _engine
+
+
+def use_engine(engine):
+    """Make every command use ``engine``, for example a benchmark database."""
+    global _engine, _session_factory
+    _engine = engine
+    _session_factory = None
+
+
+def DBSession():
+    """Open a new session, creating the session factory on the first call."""
+    global _session_factory
+    if _session_factory is None:
+        from sqlalchemy.orm import sessionmaker
+        _session_factory = sessionmaker(bind=get_engine())
+    return _session_factory()
+
+
+def get_async_engine():
+    """Return the asyncio engine shared by the HTTP API, creating it on the first call."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine()
+    return _async_engine
+
+
+def AsyncDBSession():
+    """Open a new asyncio session on the shared asyncio engine."""
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _async_session_factory = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+    return _async_session_factory()
+
+
+def _is_lock_error(error):
+    message = str(error.orig).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_lock(work, rollback=None):
+    """Call ``work()`` and return its result, retrying while the database is locked.
+
+    SQLite waits up to the busy timeout for a lock, but a transaction that
+    read before it wrote can be refused straight away when another writer
+    got in first. ``work`` must run a whole transaction so that it can be
+    repeated; ``rollback`` is called before each retry. Retries back off
+    exponentially.
+    """
+    from sqlalchemy.exc import OperationalError
+
+    retries = setting('lock_retries')
+    for attempt in range(retries + 1):
+        try:
+            return work()
+        except OperationalError as error:
+            if attempt == retries or not _is_lock_error(error):
+                raise
+            if rollback is not None:
+                rollback()
+            time.sleep(_lock_retry_delay(attempt))
+
+
+async def retry_on_lock_async(work, rollback=None):
+    """retry_on_lock() for coroutines: ``work`` and ``rollback`` are awaited."""
+    import asyncio
+    from sqlalchemy.exc import OperationalError
+
+    retries = setting('lock_retries')
+    for attempt in range(retries + 1):
+        try:
+            return await work()
+        except OperationalError as error:
+            if attempt == retries or not _is_lock_error(error):
+                raise
+            if rollback is not None:
+                await rollback()
+            await asyncio.sleep(_lock_retry_delay(attempt))
+
+
+def _lock_retry_delay(attempt):
+    # Exponential backoff, with jitter so that competing writers spread out
+    return setting('lock_retry_delay') * 2 ** attempt * random.uniform(1, 1.5)
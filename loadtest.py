@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import click
+
+try:
+    import aiohttp
+except ImportError as error:
+    raise SystemExit("The load test needs aiohttp: pip install aiohttp") from error
+
+DEFAULT_REQUESTS = (
+    'GET /books?limit=50',
+    'GET /books/search?q=river&limit=20',
+    'GET /customers?limit=50',
+    'GET /orders?limit=50',
+    'GET /inventory?limit=50',
+)
+
+
+def _parse_request(value):
+    """Split "METHOD PATH [JSON BODY]" into its parts."""
+    method, _, rest = value.partition(' ')
+    path, _, body = rest.partition(' ')
+    if not path.startswith('/'):
+        raise click.BadParameter(f"expected 'METHOD /path [JSON]', got {value!r}")
+    return method.upper(), path, json.loads(body) if body else None
+
+
+def _percentile(latencies, percent):
+    if len(latencies) < 2:
+        return latencies[0] if latencies else None
+    return statistics.quantiles(latencies, n=100, method='inclusive')[percent - 1]
+
+
+def _summary(latencies, elapsed):
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 50), 3) if latencies else None,
+        'p99_ms': round(_percentile(latencies, 99), 3) if latencies else None,
+        'max_ms': round(max(latencies), 3) if latencies else None,
+    }
+
+
+async def _run(url, requests, concurrency, duration):
+    """Send the requests round robin from ``concurrency`` clients for ``duration`` seconds."""
+    parsed = {request: _parse_request(request) for request in requests}
+    latencies = {request: [] for request in requests}
+    errors = {}
+    next_request = itertools.cycle(requests)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(url, connector=connector) as session:
+
+        async def client(deadline):
+            while time.perf_counter() < deadline:
+                request = next(next_request)
+                method, path, body = parsed[request]
+                started = time.perf_counter()
+                try:
+                    async with session.request(method, path, json=body) as response:
+                        await response.read()
+                        status = response.status
+                except aiohttp.ClientError as error:
+                    status = type(error).__name__
+                if isinstance(status, int) and status < 400:
+                    latencies[request].append((time.perf_counter() - started) * 1000)
+                else:
+                    errors[f"{request} -> {status}"] = errors.get(f"{request} -> {status}", 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(started + duration) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return latencies, errors, elapsed
+
+
+async def _wait_until_up(url, timeout=10):
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession(url) as session:
+        while True:
+            try:
+                async with session.get('/books?limit=1') as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientError:
+                if time.perf_counter() > deadline:
+                    raise click.ClickException(f"API did not start on {url}")
+                await asyncio.sleep(0.1)
+
+
+@click.command()
+@click.option('--url', default='http://127.0.0.1:8080', show_default=True, help="Base URL of the API.")
+@click.option('--request', 'requests', multiple=True,
+              help="Request to send, as 'METHOD /path [JSON body]'. Can be repeated; "
+                   "defaults to the list and search endpoints.")
+@click.option('--concurrency', type=click.IntRange(min=1), default=20, show_default=True,
+              help="Number of concurrent clients.")
+@click.option('--duration', type=click.FloatRange(min=0.1), default=10, show_default=True, help="Seconds to run for.")
+@click.option('--start', is_flag=True, help="Start api.py on the --url port for the run and stop it afterwards.")
+@click.option('--output', type=click.Path(dir_okay=False), help="Write the JSON results here as well as to stdout.")
+def loadtest(url, requests, concurrency, duration, start, output):
+    """Load test the HTTP API and report p50/p99 latency and requests/sec as JSON"""
+    requests = requests or DEFAULT_REQUESTS
+    for request in requests:
+        _parse_request(request)
+
+    server = None
+    if start:
+        port = str(urlsplit(url).port or 80)
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api.py')
+        server = subprocess.Popen([sys.executable, script, '--port', port])
+    try:
+        if server:
+            asyncio.run(_wait_until_up(url))
+        latencies, errors, elapsed = asyncio.run(_run(url, requests, concurrency, duration))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        **_summary(list(itertools.chain.from_iterable(latencies.values())), elapsed),
+        'errors': errors,
+        'endpoints': {request: _summary(values, elapsed) for request, values in latencies.items()},
+    }
+    text_report = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as output_file:
+            output_file.write(text_report + "\n")
+    click.echo(text_report)
+
+
+if __name__ == '__main__':
+    loadtest()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -8,7 +8,7 @@ class AuthorGenre(Base):
     __tablename__ = 'author_genre'
     
     id = Column(Integer, primary_key=True)
-    author_name = Column(String)
+    author_name = Column(String, index=True, unique=True)
     birth_year = Column(Integer)
     nationality = Column(String)
     genre_name = Column(String)
@@ -23,25 +23,33 @@ class Book(Base):
     title = Column(String)
     
     # Define foreign key relationships for author and genre
-    author_id = Column(Integer, ForeignKey('author_genre.id'))
-    genre_id = Column(Integer, ForeignKey('genre.id'))
+    author_id = Column(Integer, ForeignKey('author_genre.id'), index=True)
+    genre_id = Column(Integer, ForeignKey('genre.id'), index=True)
     
-    publication_year = Column(Integer)
-    price = Column(Float)
+    # Indexed for price and year range searches and sorts
+    publication_year = Column(Integer, index=True)
+    price = Column(Float, index=True)
 
     # Define many-to-one relationship with author_genre for author and genre
     author = relationship('AuthorGenre', foreign_keys=[author_id], back_populates='books')
     genre = relationship('Genre', foreign_keys=[genre_id], back_populates='books')
 
-    # Define one-to-many relationship with order_items
-    order_items = relationship('OrderItem', back_populates='book')  # This line should be included
+    # Define one-to-many relationship with the order lines that sold this book
+    order_lines = relationship('OrderLine', back_populates='book')
+
+    # Define one-to-one relationship with the book's stock row
+    inventory = relationship('Inventory', back_populates='book', uselist=False, cascade='all, delete-orphan')
+
+    # Bumped on every update, which only applies if the row still has the version that was read
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
 
    
 class Genre(Base):
     __tablename__ = 'genre'
 
     id = Column(Integer, primary_key=True)
-    genre_name = Column(String)
+    genre_name = Column(String, index=True, unique=True)
 
     # Define a one-to-many relationship with books
     books = relationship('Book', back_populates='genre')
@@ -54,23 +62,102 @@ class Customer(Base):
     email = Column(String)
     phone = Column(String)
 
-    # Define a one-to-many relationship with order_items
-    order_items = relationship('OrderItem', back_populates='customer')
+    # Define a one-to-many relationship with orders
+    orders = relationship('Order', back_populates='customer')
+
+    # Define one-to-one relationship with the customer's order summary
+    summary = relationship('CustomerSummary', uselist=False, cascade='all, delete-orphan')
+
+    # Bumped on every update, which only applies if the row still has the version that was read
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+class Order(Base):
+    __tablename__ = 'orders'
+
+    # Customer order history is read by customer and date range
+    __table_args__ = (
+        Index('ix_orders_customer_id_order_date', 'customer_id', 'order_date'),
+    )
 
-class OrderItem(Base):
-    __tablename__ = 'order_item'
-    
     order_id = Column(Integer, primary_key=True)
-    customer_id = Column(Integer, ForeignKey('customer.customer_id'))
-    book_id = Column(Integer, ForeignKey('book.book_id'))
-    order_date = Column(Date)
-    total_amount = Column(Float)
-    quantity_in_stock = Column(Integer)
+    # Indexed on its own for customer-history, which pages by order ID
+    customer_id = Column(Integer, ForeignKey('customer.customer_id'), index=True)
+    # Indexed for date ranges across all customers, as in reorder-report and archive-orders
+    order_date = Column(Date, index=True)
+
+    # Sum of the lines' amounts, kept current as lines are added
+    total_amount = Column(Float, nullable=False, default=0, server_default='0')
 
-    # Define many-to-one relationships with customer and book
-    customer = relationship('Customer', back_populates='order_items')
-    book = relationship('Book', back_populates='order_items')
+    # Define many-to-one relationship with customer and one-to-many with lines
+    customer = relationship('Customer', back_populates='orders')
+    lines = relationship('OrderLine', back_populates='order', cascade='all, delete-orphan',
+                         order_by='OrderLine.line_id')
 
     # Method to calculate the total order amount
     def calculate_total_amount(self):
-        return self.total_amount
+        return round(sum(line.amount for line in self.lines), 2)
+
+class OrderLine(Base):
+    __tablename__ = 'order_line'
+
+    line_id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.order_id'), nullable=False, index=True)
+    book_id = Column(Integer, ForeignKey('book.book_id'), index=True)
+    quantity = Column(Integer, nullable=False, default=1, server_default='1')
+    unit_price = Column(Float)
+
+    # Define many-to-one relationships with order and book
+    order = relationship('Order', back_populates='lines')
+    book = relationship('Book', back_populates='order_lines')
+
+    @property
+    def amount(self):
+        return round((self.unit_price or 0) * self.quantity, 2)
+
+class Inventory(Base):
+    __tablename__ = 'inventory'
+
+    # One stock row per book; sales decrement it with a conditional UPDATE
+    book_id = Column(Integer, ForeignKey('book.book_id'), primary_key=True)
+    quantity_in_stock = Column(Integer, nullable=False, default=0)
+
+    # Define one-to-one relationship with book
+    book = relationship('Book', back_populates='inventory')
+
+    # Bumped on every update, sales included, so a stock edit cannot undo a sale it did not see
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+# Sales rollups, updated as orders are added so reports never scan order_line
+class SalesByDay(Base):
+    __tablename__ = 'sales_by_day'
+
+    sale_date = Column(Date, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class SalesByGenre(Base):
+    __tablename__ = 'sales_by_genre'
+
+    sale_date = Column(Date, primary_key=True)
+    genre_id = Column(Integer, ForeignKey('genre.id'), primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class SalesByAuthor(Base):
+    __tablename__ = 'sales_by_author'
+
+    sale_date = Column(Date, primary_key=True)
+    author_id = Column(Integer, ForeignKey('author_genre.id'), primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+# Per-customer totals, updated as orders are added so the till reads one row
+class CustomerSummary(Base):
+    __tablename__ = 'customer_summary'
+
+    customer_id = Column(Integer, ForeignKey('customer.customer_id'), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=False, default=0)
+    last_order_date = Column(Date)
@@ -0,0 +1,135 @@
+"""SQL profiling for the --profile option of cli.py.
+
+Every statement sent by any engine is timed through the
+``before_cursor_execute`` and ``after_cursor_execute`` events. Statements
+are grouped by fingerprint, the SQL with literals and IN lists
+normalised, so the same query run once per row shows up as one
+fingerprint with a high count: the signature of an N+1 query.
+"""
+import cProfile
+import json
+import re
+import time
+from collections import defaultdict
+
+import click
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# A fingerprint run this many times in one command is reported as a possible N+1
+N_PLUS_ONE_THRESHOLD = 10
+
+# Fingerprints shown in the report, slowest total first
+REPORT_TOP = 10
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """Normalise a statement so that runs with different values compare equal."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _LITERALS.sub('?', statement)
+    return _IN_LISTS.sub('(?, ...)', statement)
+
+
+class SQLProfiler:
+    """Context manager that records every statement run while it is active.
+
+    With ``report`` a summary is written to stderr on exit. ``output`` is a
+    file to dump to: a cProfile of the whole command if it ends in
+    ``.prof``, otherwise a JSON trace of the statements.
+    """
+
+    def __init__(self, command, report=True, output=None):
+        self.command = command
+        self.report = report
+        self.output = output
+        self.statements = []
+        self.profile = cProfile.Profile() if output and output.endswith('.prof') else None
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._before)
+        event.listen(Engine, 'after_cursor_execute', self._after)
+        self.started = time.perf_counter()
+        if self.profile:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile:
+            self.profile.disable()
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+        event.remove(Engine, 'before_cursor_execute', self._before)
+        event.remove(Engine, 'after_cursor_execute', self._after)
+        if self.report:
+            self.print_report()
+        if self.profile:
+            self.profile.dump_stats(self.output)
+        elif self.output:
+            with open(self.output, 'w') as output_file:
+                json.dump(self.trace(), output_file, indent=2)
+                output_file.write("\n")
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info['profile_started'].pop()) * 1000
+        rows = len(parameters) if executemany else 1
+        self.statements.append((statement, elapsed, rows))
+
+    def fingerprints(self):
+        """Statements grouped by fingerprint, slowest total time first."""
+        groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        for statement, elapsed, _ in self.statements:
+            group = groups[fingerprint(statement)]
+            group['count'] += 1
+            group['total_ms'] += elapsed
+            group['max_ms'] = max(group['max_ms'], elapsed)
+        return sorted(
+            ({'fingerprint': key, **group} for key, group in groups.items()),
+            key=lambda group: group['total_ms'], reverse=True,
+        )
+
+    def trace(self):
+        fingerprints = self.fingerprints()
+        return {
+            'command': self.command,
+            'wall_ms': round(self.wall_ms, 3),
+            'statement_count': len(self.statements),
+            'sql_ms': round(sum(elapsed for _, elapsed, _ in self.statements), 3),
+            'statements': [
+                {'sql': statement, 'ms': round(elapsed, 3), 'rows': rows}
+                for statement, elapsed, rows in self.statements
+            ],
+            'fingerprints': fingerprints,
+            'possible_n_plus_one': [
+                group['fingerprint'] for group in fingerprints if group['count'] >= N_PLUS_ONE_THRESHOLD
+            ],
+        }
+
+    def print_report(self):
+        fingerprints = self.fingerprints()
+        sql_ms = sum(elapsed for _, elapsed, _ in self.statements)
+
+        def echo(line=""):
+            click.echo(line, err=True)
+
+        echo()
+        echo(f"SQL profile: {len(self.statements)} statements, {sql_ms:.1f} ms in SQL, "
+             f"{self.wall_ms:.1f} ms in total")
+        if fingerprints:
+            echo(f"{'count':>7} {'total ms':>10} {'avg ms':>8}  statement")
+            for group in fingerprints[:REPORT_TOP]:
+                echo(f"{group['count']:>7} {group['total_ms']:>10.2f} {group['total_ms'] / group['count']:>8.3f}  "
+                     f"{_shorten(group['fingerprint'])}")
+        repeated = [group for group in fingerprints if group['count'] >= N_PLUS_ONE_THRESHOLD]
+        for group in repeated:
+            echo(f"Possible N+1: ran {group['count']} times: {_shorten(group['fingerprint'])}")
+
+
+def _shorten(statement, width=100):
+    return statement if len(statement) <= width else statement[:width - 3] + "..."
+
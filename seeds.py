@@ -1,76 +1,199 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base, AuthorGenre, Book, Genre, Customer, OrderItem
-from datetime import datetime
-
-# actual database URL
-database_url = 'sqlite:///bookstore.db'
-
-engine = create_engine(database_url)
-Base.metadata.bind = engine
-
-DBSession = sessionmaker(bind=engine)
-session = DBSession()
-
-# Seed data for AuthorGenre
-# Seed data for AuthorGenre
-authors = [
-    AuthorGenre(author_name='F. Scott Fitzgerald', birth_year=1900, nationality='American', genre_name='Fiction')
+import random
+import time
+from datetime import date, timedelta
+from itertools import chain, count
+
+import click
+from sqlalchemy import func, insert, select, text
+from models import AuthorGenre, Book, Genre, Customer, Inventory, Order, OrderLine
+from commands.archive import create_history_views
+from commands.reports import REBUILD_SALES_ROLLUPS_SQL
+from db import create_engine, database_url
+
+# Rows sent per executemany call
+CHUNK_SIZE = 10000
+
+FIRST_NAMES = [
+    'Ada', 'Amara', 'Aaron', 'Chinua', 'Grace', 'James', 'Jane', 'Kofi', 'Leo', 'Lidwin',
+    'Margaret', 'Mary', 'Ngugi', 'Olive', 'Ruth', 'Scott', 'Toni', 'Virginia', 'Wanjiru', 'Zadie',
 ]
-
-session.add_all(authors)
-session.commit()
-
-# Seed data for Genre
-genres = [
-    Genre(genre_name='Fiction')
+LAST_NAMES = [
+    'Achebe', 'Adichie', 'Atwood', 'Austen', 'Baldwin', 'Bronte', 'Fitzgerald', 'Gordimer', 'Kipngeno',
+    'Morrison', 'Ogot', 'Orwell', 'Shelley', 'Smith', 'Thiong\'o', 'Tolstoy', 'Wa Thiong\'o', 'Woolf',
 ]
-
-session.add_all(genres)
-session.commit()
-
-authors = [
-    AuthorGenre(author_name='Author 1', birth_year=1980, nationality='Nationality 1', genre_name='Genre 1'),
-    AuthorGenre(author_name='Author 2', birth_year=1990, nationality='Nationality 2', genre_name='Genre 2')
+GENRE_NAMES = [
+    'Fiction', 'Literature', 'Biography', 'History', 'Science', 'Poetry', 'Drama', 'Romance', 'Mystery',
+    'Thriller', 'Fantasy', 'Science Fiction', 'Children', 'Young Adult', 'Travel', 'Cookery', 'Art',
+    'Religion', 'Business', 'Self Help',
 ]
-
-session.add_all(authors)
-session.commit()
-
-# Seed data for Genre
-genres = [
-    Genre(genre_name='Genre 1'),
-    Genre(genre_name='Genre 2')
+TITLE_WORDS = [
+    'river', 'between', 'night', 'garden', 'things', 'fall', 'apart', 'great', 'house', 'stone', 'child',
+    'weep', 'not', 'grain', 'wheat', 'petals', 'blood', 'yellow', 'sun', 'half', 'purple', 'hibiscus',
+    'tender', 'beloved', 'song', 'solomon', 'waves', 'lighthouse', 'city', 'road', 'silent', 'winter',
+    'summer', 'dream', 'shadow', 'kingdom', 'last', 'first', 'journey', 'letters', 'north', 'season',
 ]
-
-session.add_all(genres)
-session.commit()
-
-# Seed data for Book
-books = [
-    Book(title='Book 1', author_id=1, genre_id=1, publication_year=2000, price=20.0),
-    Book(title='Book 2', author_id=2, genre_id=2, publication_year=2010, price=215.0)
-]
-
-session.add_all(books)
-session.commit()
-
-# Seed data for Customer
-customers = [
-    Customer(customer_name='Customer 1', email='customer1@example.com', phone='123-456-7890'),
-    Customer(customer_name='Customer 2', email='customer2@example.com', phone='987-654-3210')
-]
-
-session.add_all(customers)
-session.commit()
-
-# Seed data for OrderItem
-order_items = [
-    OrderItem(customer_id=1, book_id=1, order_date=datetime.now(), total_amount=20.0, quantity_in_stock=10),
-    OrderItem(customer_id=2, book_id=2, order_date=datetime.now(), total_amount=25.0, quantity_in_stock=5)
-]
-
-session.add_all(order_items)
-session.commit()
-
-session.close()
+NATIONALITIES = ['Kenyan', 'Nigerian', 'British', 'American', 'Canadian', 'South African', 'Ghanaian', 'Russian']
+
+
+def _count(value):
+    """Click type helper: accept counts such as 1e6 as well as plain integers."""
+    return int(float(value))
+
+
+def _next_id(connection, column):
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _insert_rows(connection, table, rows):
+    """Insert generated rows with one executemany per CHUNK_SIZE rows."""
+    chunk = []
+    inserted = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            connection.execute(insert(table), chunk)
+            inserted += len(chunk)
+            chunk = []
+    if chunk:
+        connection.execute(insert(table), chunk)
+        inserted += len(chunk)
+    return inserted
+
+
+def generate(engine, books, customers, orders, seed, authors=None, genres=None, echo=print):
+    """Write a deterministic synthetic dataset of the given size.
+
+    The same ``seed`` and sizes always produce the same rows. New rows get
+    IDs after any that already exist, so the generator can also top up an
+    existing database.
+    """
+    rng = random.Random(seed)
+    authors = authors or max(1, books // 20)
+    genres = genres or min(len(GENRE_NAMES), max(1, books // 1000) + 5)
+
+    with engine.begin() as connection:
+        first_author = _next_id(connection, AuthorGenre.id)
+        first_genre = _next_id(connection, Genre.id)
+        first_book = _next_id(connection, Book.book_id)
+        first_customer = _next_id(connection, Customer.customer_id)
+
+        # Seed data for Genre, skipping names that are already taken
+        existing = set(connection.execute(select(Genre.genre_name)).scalars())
+        names = (
+            name for name in chain(GENRE_NAMES, (f"Genre {i}" for i in count(1)))
+            if name not in existing
+        )
+        genre_ids = range(first_genre, first_genre + genres)
+        started = time.perf_counter()
+        _insert_rows(connection, Genre.__table__, (
+            {'id': genre_id, 'genre_name': name} for genre_id, name in zip(genre_ids, names)
+        ))
+
+        # Seed data for AuthorGenre
+        author_ids = range(first_author, first_author + authors)
+        _insert_rows(connection, AuthorGenre.__table__, (
+            {
+                'id': author_id,
+                'author_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {author_id}",
+                'birth_year': rng.randint(1800, 2000),
+                'nationality': rng.choice(NATIONALITIES),
+                'genre_name': rng.choice(GENRE_NAMES),
+            }
+            for author_id in author_ids
+        ))
+        echo(f"{genres} genres and {authors} authors ({time.perf_counter() - started:.1f}s)")
+
+    # Seed data for Book and Inventory
+    book_ids = range(first_book, first_book + books)
+    prices = [round(rng.uniform(5, 60), 2) for _ in book_ids]
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        _insert_rows(connection, Book.__table__, (
+            {
+                'book_id': book_id,
+                'title': " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 4))).title(),
+                'author_id': rng.choice(author_ids),
+                'genre_id': rng.choice(genre_ids),
+                'publication_year': rng.randint(1900, 2024),
+                'price': price,
+            }
+            for book_id, price in zip(book_ids, prices)
+        ))
+        _insert_rows(connection, Inventory.__table__, (
+            {'book_id': book_id, 'quantity_in_stock': rng.randint(0, 200)}
+            for book_id in book_ids
+        ))
+    echo(f"{books} books ({time.perf_counter() - started:.1f}s)")
+
+    # Seed data for Customer
+    customer_ids = range(first_customer, first_customer + customers)
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        _insert_rows(connection, Customer.__table__, (
+            {
+                'customer_id': customer_id,
+                'customer_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                'email': f"customer{customer_id}@example.com",
+                'phone': f"07{rng.randint(0, 99999999):08d}",
+            }
+            for customer_id in customer_ids
+        ))
+    echo(f"{customers} customers ({time.perf_counter() - started:.1f}s)")
+
+    # Seed data for Order and OrderLine
+    if orders and books and customers:
+        first_day = date(2020, 1, 1)
+        days = (date(2024, 12, 31) - first_day).days
+        started = time.perf_counter()
+
+        with engine.begin() as connection:
+            create_history_views(connection)
+            first_order = _next_id(connection, Order.order_id)
+            order_rows, line_rows = [], []
+            for order_id in range(first_order, first_order + orders):
+                # Most orders are a single book, some are baskets of two or three
+                lines = []
+                for _ in range(rng.choice((1, 1, 1, 2, 3))):
+                    book = rng.randrange(books)
+                    lines.append({
+                        'order_id': order_id,
+                        'book_id': book_ids[book],
+                        'quantity': rng.randint(1, 3),
+                        'unit_price': prices[book],
+                    })
+                order_rows.append({
+                    'order_id': order_id,
+                    'customer_id': rng.choice(customer_ids),
+                    'order_date': first_day + timedelta(days=rng.randint(0, days)),
+                    'total_amount': round(sum(line['unit_price'] * line['quantity'] for line in lines), 2),
+                })
+                line_rows.extend(lines)
+                if len(order_rows) == CHUNK_SIZE:
+                    _insert_rows(connection, Order.__table__, order_rows)
+                    _insert_rows(connection, OrderLine.__table__, line_rows)
+                    order_rows, line_rows = [], []
+            _insert_rows(connection, Order.__table__, order_rows)
+            _insert_rows(connection, OrderLine.__table__, line_rows)
+            for statement in REBUILD_SALES_ROLLUPS_SQL:
+                connection.execute(text(statement))
+        echo(f"{orders} orders ({time.perf_counter() - started:.1f}s)")
+
+
+@click.command()
+@click.option('--books', type=_count, default=100, show_default=True, help="Number of books, e.g. 1e6.")
+@click.option('--customers', type=_count, default=50, show_default=True, help="Number of customers.")
+@click.option('--orders', type=_count, default=500, show_default=True, help="Number of orders.")
+@click.option('--authors', type=_count, help="Number of authors. Defaults to one per 20 books.")
+@click.option('--genres', type=_count, help="Number of genres.")
+@click.option('--seed', type=int, default=42, show_default=True, help="Random seed; the same seed gives the same data.")
+@click.option('--database-url', default=database_url, show_default=True, help="Database to seed.")
+def seed(books, customers, orders, authors, genres, seed, database_url):
+    """Fill the database with deterministic synthetic data"""
+    engine = create_engine(database_url)
+    started = time.perf_counter()
+    generate(engine, books, customers, orders, seed, authors=authors, genres=genres, echo=click.echo)
+    click.echo(f"Seeded {database_url} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    seed()